@@ -11,6 +11,40 @@ from tree_sitter import Language, Parser
 from typing import List
 
 
+# 不可能包含声明、函数定义或调用表达式的节点类型，遍历语法树时不再深入其子树
+PRUNED_NODE_TYPES = frozenset(('string_literal', 'concatenated_string', 'char_literal',
+                               'comment', 'number_literal', 'true', 'false', 'null'))
+
+
+def pruned_kind_ids(language: Language) -> frozenset:
+    """PRUNED_NODE_TYPES 在给定语言中的节点类型ID，遍历时用整数比较代替字符串比较"""
+    return frozenset(language.id_for_node_kind(kind, True) for kind in PRUNED_NODE_TYPES)
+
+
+def traverse_tree(node, pruned_ids: frozenset):
+    """
+    使用TreeCursor迭代遍历语法树的节点（先序），避免递归开销
+    
+    类型ID在 pruned_ids 中的节点（见 pruned_kind_ids）不会被产出，也不深入其子树
+    """
+    cursor = node.walk()
+    
+    visited_children = False
+    while True:
+        if not visited_children:
+            current = cursor.node
+            if current.kind_id in pruned_ids:
+                visited_children = True
+                continue
+            yield current
+            if not cursor.goto_first_child():
+                visited_children = True
+        elif cursor.goto_next_sibling():
+            visited_children = False
+        elif not cursor.goto_parent():
+            break
+
+
 class BaseAnalyzer:
     """基础分析器"""
     
@@ -30,6 +64,32 @@ class BaseAnalyzer:
         self.parser = Parser(self.language)
         self.language_name = language
     
+    @staticmethod
+    def _shorten_text(text: str, max_len: int = 50) -> str:
+        """
+        将语句文本压成单行并截断，用于打印边/语句信息
+        
+        先截断再替换换行（替换不改变长度），函数定义等大节点无需对全文做替换
+        """
+        text = text.strip()
+        if len(text) > max_len:
+            return text[:max_len - 3].replace('\n', ' ') + "..."
+        return text.replace('\n', ' ')
+    
+    def _node_text_shortener(self, max_len: int = 50):
+        """
+        返回按节点缓存结果的 _shorten_text：同一节点出现在多条边中时只截断一次
+        """
+        cache = {}
+        
+        def shorten(node) -> str:
+            text = cache.get(node.id)
+            if text is None:
+                text = cache[node.id] = self._shorten_text(node.text, max_len)
+            return text
+        
+        return shorten
+    
     def parse_code(self, code: str):
         """解析代码"""
         tree = self.parser.parse(bytes(code, 'utf-8'))
@@ -6,11 +6,11 @@
 借鉴static_program_analysis_by_tree_sitter/CDG.py, 并优化为使用高效的Lengauer-Tarjan算法
 """
 
+import sys
 from typing import List, Dict, Optional, Set
 from .cfg import CFG
 from .graph import Graph, Edge, EdgeType
 from .node import Node
-from .visualization import visualize_cdg
 
 
 class CDGNode(Node):
@@ -392,6 +392,7 @@ class CDG(CFG):
         """可视化CDG"""
         cdg = self.construct_cdg(code)
         if cdg:
+            from .visualization import visualize_cdg
             visualize_cdg([cdg], filename, pdf, dot_format, view)
         return cdg
     
@@ -406,23 +407,19 @@ class CDG(CFG):
             print("该图没有边")
             return
             
+        lines = []
         for i, edge in enumerate(self.cdg.edges, 1):
             if edge.source_node and edge.target_node:
-                source_text = edge.source_node.text.strip().replace('\n', ' ')
-                target_text = edge.target_node.text.strip().replace('\n', ' ')
+                source_text = self._shorten_text(edge.source_node.text)
+                target_text = self._shorten_text(edge.target_node.text)
                 source_id = edge.source_node.id
                 target_id = edge.target_node.id
                 
-                # 限制文本长度，避免过长
-                if len(source_text) > 50:
-                    source_text = source_text[:47] + "..."
-                if len(target_text) > 50:
-                    target_text = target_text[:47] + "..."
-                
                 # 显示边的标签信息（如entry、branch等）
                 label_info = f" [{edge.label}]" if edge.label else ""
-                print(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}){label_info}")
+                lines.append(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}){label_info}")
             else:
-                print(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
+                lines.append(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
         
-        print(f"\n总计: {len(self.cdg.edges)} 条边")
\ No newline at end of file
+        lines.append(f"\n总计: {len(self.cdg.edges)} 条边")
+        sys.stdout.write('\n'.join(lines) + '\n')
\ No newline at end of file
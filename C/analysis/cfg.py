@@ -5,11 +5,11 @@
 基于tree-sitter构建函数级控制流图
 """
 
+import sys
 from typing import Optional
 from .base import BaseAnalyzer
 from .node import Node
 from .graph import Graph, Edge, EdgeType
-from .visualization import visualize_cfg
 
 class CFG(BaseAnalyzer):
     """单函数控制流图构建器"""
@@ -351,12 +351,15 @@ class CFG(BaseAnalyzer):
             self.cfg = None
             return None
     
-    def see_cfg(self, code: str, filename: str = 'CFG', pdf: bool = True, dot_format: bool = True, view: bool = False):
-        """可视化单个函数的CFG"""
+    def see_cfg(self, code: str, filename: str = 'CFG', pdf: bool = True, dot_format: bool = True, view: bool = False,
+                collapse_chains: bool = False):
+        """可视化单个函数的CFG；collapse_chains为True时直线语句序列合并为一个节点"""
         try:
             cfg = self.construct_cfg(code)
             if cfg:
-                visualize_cfg([cfg], filename, pdf, dot_format, view)
+                # 可视化依赖 graphviz，仅在需要绘图时导入
+                from .visualization import visualize_cfg
+                visualize_cfg([cfg], filename, pdf, dot_format, view, collapse_chains)
             return cfg
         except Exception as e:
             print(f'⚠️  CFG构建警告: 代码解析失败: {e}')
@@ -374,24 +377,21 @@ class CFG(BaseAnalyzer):
             print("该图没有边")
             return
             
+        lines = []
+        shorten = self._node_text_shortener()
         for i, edge in enumerate(self.cfg.edges, 1):
             if edge.source_node and edge.target_node:
-                source_text = edge.source_node.text.strip().replace('\n', ' ')
-                target_text = edge.target_node.text.strip().replace('\n', ' ')
+                source_text = shorten(edge.source_node)
+                target_text = shorten(edge.target_node)
                 source_id = edge.source_node.id
                 target_id = edge.target_node.id
                 
-                # 限制文本长度，避免过长
-                if len(source_text) > 50:
-                    source_text = source_text[:47] + "..."
-                if len(target_text) > 50:
-                    target_text = target_text[:47] + "..."
-                
-                print(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id})")
+                lines.append(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id})")
             else:
-                print(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
+                lines.append(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
         
-        print(f"\n总计: {len(self.cfg.edges)} 条边")
+        lines.append(f"\n总计: {len(self.cfg.edges)} 条边")
+        sys.stdout.write('\n'.join(lines) + '\n')
     
     def print_statement_defs_uses(self):
         """打印CFG中每条语句的defs和uses信息"""
@@ -404,25 +404,25 @@ class CFG(BaseAnalyzer):
             print("该图没有节点")
             return
         
+        lines = []
         # 按行号排序节点
         sorted_nodes = sorted(self.cfg.nodes, key=lambda node: node.line)
         
         for i, node in enumerate(sorted_nodes, 1):
             # 获取语句文本，限制长度
-            stmt_text = node.text.strip().replace('\n', ' ')
-            if len(stmt_text) > 60:
-                stmt_text = stmt_text[:57] + "..."
+            stmt_text = self._shorten_text(node.text, 60)
             
             # 格式化defs和uses
             defs_str = ', '.join(sorted(node.defs)) if node.defs else "无"
             uses_str = ', '.join(sorted(node.uses)) if node.uses else "无"
             
-            print(f"{i:3d}. 行{node.line:3d}: {stmt_text}")
-            print(f"     Defs: {defs_str}")
-            print(f"     Uses: {uses_str}")
-            print()
+            lines.append(f"{i:3d}. 行{node.line:3d}: {stmt_text}")
+            lines.append(f"     Defs: {defs_str}")
+            lines.append(f"     Uses: {uses_str}")
+            lines.append('')
         
-        print(f"总计: {len(sorted_nodes)} 个语句节点")
+        lines.append(f"总计: {len(sorted_nodes)} 个语句节点")
+        sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def main():
@@ -5,10 +5,10 @@
 基于CFG构建数据依赖图
 """
 
+import sys
 from typing import Optional
 from .cfg import CFG
 from .graph import Graph, DDGEdge
-from .visualization import visualize_ddg
 
 class DDG(CFG):
     """数据依赖图构建器 - 单函数版本"""
@@ -76,15 +76,14 @@ class DDG(CFG):
         
         for node_id, vars_set in cfg.defs.items():
             for var in vars_set:
-                if var not in defs:
-                    defs[var] = []
-                defs[var].append(node_id)
+                defs.setdefault(var, []).append(node_id)
         
         for node_id, vars_set in cfg.uses.items():
             for var in vars_set:
-                if var not in uses:
-                    uses[var] = []
-                uses[var].append(node_id)
+                uses.setdefault(var, []).append(node_id)
+        
+        # 出边结构只构建一次，供所有路径查询复用
+        outgoing_edges = cfg.get_outgoing_edges()
         
         # 情况1: def X to use Y (def节点到use节点)
         for X in defs:
@@ -92,6 +91,8 @@ class DDG(CFG):
                 continue
             def_nodes = defs[X]
             use_nodes = uses[X]
+            # 定义X的节点集合每个变量只构建一次，各 (d, u) 对只需从中去掉起点和终点
+            def_node_set = set(def_nodes)
             
             for d in def_nodes:
                 for u in use_nodes:
@@ -100,15 +101,12 @@ class DDG(CFG):
                     
                     # 优化v2：使用hasPathAvoidingNodes + BFS
                     # 找出所有重新定义变量X的节点（排除起点d和终点u）
-                    avoid_nodes = set()
-                    for node_id in def_nodes:
-                        if node_id != d and node_id != u:
-                            avoid_nodes.add(node_id)
+                    avoid_nodes = def_node_set - {d, u}
                     
                     # 检查是否存在一条从d到u的路径，不经过其他定义X的节点
-                    if cfg.hasPathAvoidingNodes(d, u, avoid_nodes):
-                        edge.setdefault((d, u), set())
-                        edge[(d, u)].add(X)
+                    if cfg.hasPathAvoidingNodes(d, u, avoid_nodes, outgoing_edges):
+                        # 只构造一次键元组、做一次哈希查找
+                        edge.setdefault((d, u), set()).add(X)
                     
                     # 旧实现（性能较差，已弃用）：
                     # 检查从d到u的所有路径，是否至少有一条路径没有中间重定义
@@ -187,6 +185,7 @@ class DDG(CFG):
         """可视化DDG - 单函数版本"""
         ddg = self.construct_ddg(code)
         if ddg:
+            from .visualization import visualize_ddg
             visualize_ddg([ddg], filename, pdf, dot_format, view)  # 传入单元素列表以兼容可视化函数
         return ddg
     
@@ -201,19 +200,15 @@ class DDG(CFG):
             print("该图没有边")
             return
             
+        lines = []
+        shorten = self._node_text_shortener()
         for i, edge in enumerate(self.ddg.edges, 1):
             if edge.source_node and edge.target_node:
-                source_text = edge.source_node.text.strip().replace('\n', ' ')
-                target_text = edge.target_node.text.strip().replace('\n', ' ')
+                source_text = shorten(edge.source_node)
+                target_text = shorten(edge.target_node)
                 source_id = edge.source_node.id
                 target_id = edge.target_node.id
                 
-                # 限制文本长度，避免过长
-                if len(source_text) > 50:
-                    source_text = source_text[:47] + "..."
-                if len(target_text) > 50:
-                    target_text = target_text[:47] + "..."
-                
                 # 显示依赖的变量信息
                 variables = []
                 if hasattr(edge, 'variables') and edge.variables:
@@ -222,8 +217,9 @@ class DDG(CFG):
                     variables = edge.token
                 
                 var_info = f" [变量: {', '.join(variables)}]" if variables else ""
-                print(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}){var_info}")
+                lines.append(f"{i:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}){var_info}")
             else:
-                print(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
+                lines.append(f"{i:3d}. [无效边: 缺少源节点或目标节点]")
         
-        print(f"\n总计: {len(self.ddg.edges)} 条边")
\ No newline at end of file
+        lines.append(f"\n总计: {len(self.ddg.edges)} 条边")
+        sys.stdout.write('\n'.join(lines) + '\n')
\ No newline at end of file
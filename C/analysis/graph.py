@@ -186,7 +186,7 @@ class Graph:
                 outgoing[source_id].append(target_id)
         return outgoing
     
-    def hasPathAvoidingNodes(self, start, end, avoid_nodes):
+    def hasPathAvoidingNodes(self, start, end, avoid_nodes, outgoing_edges=None):
         """
         检查从start到end是否存在一条路径，该路径不经过avoid_nodes中的任何节点
         
@@ -196,6 +196,8 @@ class Graph:
             start: 起始节点ID
             end: 终止节点ID
             avoid_nodes: 要避开的节点ID集合
+            outgoing_edges: 预先计算的出边结构（get_outgoing_edges()的结果），
+                批量查询时传入可避免每次重建
             
         Returns:
             bool: 是否存在满足条件的路径
@@ -207,7 +209,12 @@ class Graph:
             return False
         
         # 获取出边结构
-        outgoing_edges = self.get_outgoing_edges()
+        if outgoing_edges is None:
+            outgoing_edges = self.get_outgoing_edges()
+        
+        # 直接相连时无需BFS
+        if end in outgoing_edges.get(start, ()):
+            return True
         
         # BFS搜索
         from collections import deque
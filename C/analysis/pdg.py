@@ -5,12 +5,12 @@
 结合控制流图(CFG)和数据依赖图(DDG)构建程序依赖图
 """
 
+import sys
 from typing import Dict, Optional
 from .cfg import CFG
 from .cdg import CDG
 from .ddg import DDG
 from .graph import Graph
-from .visualization import visualize_pdg
 
 class PDG(CFG):
     """程序依赖图构建器 - 单函数版本"""
@@ -19,16 +19,16 @@ class PDG(CFG):
         """初始化PDG构建器"""
         super().__init__(language)
         self.pdg: Optional[Graph] = None  # 单个PDG图
+        # CDG/DDG构建器在每次构建时不保留状态，创建一次后重复使用
+        self.cdg_builder = CDG(language)
+        self.ddg_builder = DDG(language)
     
     def construct_pdg(self, code: str) -> Optional[Graph]:
         """构建程序依赖图 - 单函数版本"""
         try:
             # 构建CDG和DDG
-            cdg_builder = CDG(self.language_name)
-            ddg_builder = DDG(self.language_name)
-            
-            cdg_graph = cdg_builder.construct_cdg(code)
-            ddg_graph = ddg_builder.construct_ddg(code)
+            cdg_graph = self.cdg_builder.construct_cdg(code)
+            ddg_graph = self.ddg_builder.construct_ddg(code)
             
             if not cdg_graph or not ddg_graph:
                 print('⚠️  PDG构建警告: CDG或DDG构建失败')
@@ -65,6 +65,7 @@ class PDG(CFG):
         """可视化PDG - 单函数版本"""
         pdg = self.construct_pdg(code)
         if pdg:
+            from .visualization import visualize_pdg
             visualize_pdg([pdg], filename, pdf, dot_format, view)  # 传入单元素列表以兼容可视化函数
         return pdg
     
@@ -101,22 +102,17 @@ class PDG(CFG):
             print("该图没有边")
             return
             
+        lines = []
         edge_count = 1
         
         # 打印所有PDG边
         for edge in self.pdg.edges:
             if edge.source_node and edge.target_node:
-                source_text = edge.source_node.text.strip().replace('\n', ' ')
-                target_text = edge.target_node.text.strip().replace('\n', ' ')
+                source_text = self._shorten_text(edge.source_node.text)
+                target_text = self._shorten_text(edge.target_node.text)
                 source_id = edge.source_node.id
                 target_id = edge.target_node.id
                 
-                # 限制文本长度
-                if len(source_text) > 50:
-                    source_text = source_text[:47] + "..."
-                if len(target_text) > 50:
-                    target_text = target_text[:47] + "..."
-                
                 # 获取边类型信息
                 edge_type = "PDG"
                 if hasattr(edge, 'type') and hasattr(edge.type, 'name'):
@@ -131,7 +127,8 @@ class PDG(CFG):
                 elif hasattr(edge, 'token') and edge.token:
                     extra_info += f" [变量: {', '.join(edge.token)}]"
                 
-                print(f"{edge_count:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}) [{edge_type}]{extra_info}")
+                lines.append(f"{edge_count:3d}. {source_text} ({source_id}) --> {target_text} ({target_id}) [{edge_type}]{extra_info}")
                 edge_count += 1
         
-        print(f"\n总计: {len(self.pdg.edges)} 条边")
\ No newline at end of file
+        lines.append(f"\n总计: {len(self.pdg.edges)} 条边")
+        sys.stdout.write('\n'.join(lines) + '\n')
\ No newline at end of file
@@ -5,223 +5,386 @@
 提供各种图的可视化功能
 """
 
-from typing import List
-from graphviz import Digraph
+import hashlib
 import html
+import io
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import graphviz
+from io_utils import atomic_write
 from .graph import Graph, EdgeType
 
 
-def visualize_cfg(cfgs: List[Graph], filename: str = 'CFG', pdf: bool = True, dot_format: bool = True, view: bool = False):
-    """可视化CFG"""
-    dot = Digraph(comment=filename, strict=True)
-    dot.attr(rankdir='TB')
-    dot.attr('node', fontname='Arial')
-    dot.attr('edge', fontname='Arial')
+# PDF渲染缓存目录（位于输出文件所在目录下）；每个输出文件只保留最近一次渲染的缓存
+PDF_CACHE_DIR = '.cache'
+
+# 无需加引号的DOT标识符：字母/下划线开头的名字，或数字字面量
+_SAFE_DOT_ID = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?)').fullmatch
+# DOT关键字（不区分大小写）作为标识符时必须加引号
+_DOT_KEYWORDS = frozenset(('node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'))
+
+# 节点/边语句模板（属性按名称排序，label在前），每条语句只需一次 % 格式化
+_NODE_ROOT = '\t%s [label=<<B>ROOT</B><BR/>%s<SUB>%s</SUB>> fillcolor=lightgreen fontsize=14 shape=ellipse style=filled width=2.0]\n'
+_NODE_FUNCTION = '\t%s [label=<%s<SUB>%s</SUB>> fillcolor=lightblue shape=ellipse style=filled]\n'
+_NODE_BRANCH_ROOT = '\t%s [label=<%s<SUB>%s</SUB>> fillcolor=yellow shape=diamond style=filled]\n'
+_NODE_BRANCH = '\t%s [label=<%s<SUB>%s</SUB>> shape=diamond]\n'
+_NODE_STATEMENT = '\t%s [label=<%s<SUB>%s</SUB>> shape=rectangle]\n'
+_EDGE_CFG = '\t%s -> %s [label=%s]\n'
+_EDGE_CDG_ENTRY = '\t%s -> %s [label=entry color=green penwidth=2 style=solid]\n'
+_EDGE_CDG_BRANCH = '\t%s -> %s [label=branch color=orange penwidth=2 style=solid]\n'
+_EDGE_CDG = '\t%s -> %s [color=blue penwidth=1 style=solid]\n'
+_EDGE_DDG = '\t%s -> %s [label=%s color=red style=dotted]\n'
+
+
+def _cached_pdf_path(dot_bytes: bytes, filename: str) -> str:
+    """根据输出文件名和DOT源码的内容哈希计算PDF缓存路径"""
+    digest = hashlib.blake2b(dot_bytes, digest_size=16).hexdigest()
+    return os.path.join(os.path.dirname(filename), PDF_CACHE_DIR,
+                        f"{os.path.basename(filename)}_{digest}.pdf")
+
+
+def _remove_stale_pdf_caches(cached_pdf: str, filename: str):
+    # 同一输出文件只保留刚写入的缓存：图变化后旧的缓存不会再被命中，不删除会在缓存目录中不断累积
+    current = os.path.basename(cached_pdf)
+    stale_name = re.compile(re.escape(os.path.basename(filename)) + r'_[0-9a-f]{32}\.pdf').fullmatch
+    try:
+        entries = os.scandir(os.path.dirname(cached_pdf))
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name != current and stale_name(entry.name):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def _render_pdf(dot_bytes: bytes, filename: str, view: bool = False) -> str:
+    """
+    渲染PDF文件（dot_bytes 为UTF-8编码的DOT源码）
+
+    以DOT源码的内容哈希为键缓存渲染结果，图未变化时直接复制缓存的PDF，
+    省去一次dot进程调用。
+
+    Returns:
+        str: 生成的PDF文件路径
+    """
+    pdf_path = f"{filename}.pdf"
+    cached_pdf = _cached_pdf_path(dot_bytes, filename)
+
+    # 直接尝试复制缓存，不存在时再渲染，省去一次单独的 stat；
+    # 渲染放在 except 块之外，渲染出错时不会附带缓存未命中的 FileNotFoundError
+    hit = True
+    try:
+        shutil.copyfile(cached_pdf, pdf_path)
+    except FileNotFoundError:
+        hit = False
+
+    if not hit:
+        # DOT源码经标准输入交给dot，PDF从标准输出取回，在内存中直接写出结果和缓存
+        cmd = ['dot', '-Tpdf']
+        try:
+            pdf_bytes = subprocess.run(cmd, input=dot_bytes, stdout=subprocess.PIPE, check=True).stdout
+        except FileNotFoundError as e:
+            # 未安装 Graphviz：与 graphviz 库渲染时一样抛出 ExecutableNotFound
+            raise graphviz.ExecutableNotFound(cmd) from e
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+        # 原子写入，中断时不会留下不完整的缓存（否则之后每次渲染都会复制这个损坏的PDF）
+        atomic_write(cached_pdf, pdf_bytes)
+        _remove_stale_pdf_caches(cached_pdf, filename)
+
+    if view:
+        graphviz.view(pdf_path)
+    return pdf_path
+
+
+def _quote(value: str) -> str:
+    """为DOT标识符/属性值按需加引号（HTML标签 <...> 和简单标识符原样保留）"""
+    if _SAFE_DOT_ID(value) and value.lower() not in _DOT_KEYWORDS:
+        return value
+    if value.startswith('<') and value.endswith('>'):
+        return value
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def _begin_graph(title: str) -> io.StringIO:
+    """创建DOT缓冲区并写入图头部"""
+    buf = io.StringIO()
+    buf.write(f"// {title}\nstrict digraph {{\n"
+              "\trankdir=TB\n"
+              "\tnode [fontname=Arial]\n"
+              "\tedge [fontname=Arial]\n")
+    return buf
+
+
+def _end_graph(buf: io.StringIO) -> graphviz.Source:
+    """结束DOT缓冲区，返回可渲染的 graphviz.Source"""
+    buf.write('}\n')
+    return graphviz.Source(buf.getvalue())
+
+
+class _NodeIds(dict):
+    """
+    节点ID -> DOT标识符 的映射，每个节点只格式化一次，边直接复用
+
+    写节点时按需填充，无需为收集节点ID额外遍历一遍所有图
+    """
+
+    def __missing__(self, key):
+        value = self[key] = _quote(str(key))
+        return value
+
+
+def _has_nodes(graphs: List[Graph]) -> bool:
+    """图列表中是否有任何节点；没有节点时跳过所有文件写入和渲染"""
+    return any(graph.nodes for graph in graphs)
+
+
+def _statement_node(ids: _NodeIds, node, root_style: bool) -> str:
+    """生成一个语句节点的DOT语句；root_style为True时函数定义节点以ROOT样式突出显示"""
+    if node.type == 'function_definition':
+        template = _NODE_ROOT if root_style else _NODE_FUNCTION
+    elif node.is_branch:
+        template = _NODE_BRANCH_ROOT if root_style else _NODE_BRANCH
+    else:
+        # 只显示源代码，不显示节点类型
+        template = _NODE_STATEMENT
+    return template % (ids[node.id], html.escape(node.text), node.line)
+
+
+def _write_statement_nodes(w, ids: _NodeIds, nodes, root_style: bool):
+    """写入一个图的所有语句节点：整块拼接后一次写入缓冲区"""
+    w(''.join([_statement_node(ids, node, root_style) for node in nodes]))
+
+
+def _write_cfg_edge(w, ids: _NodeIds, edge):
+    """写入控制流边：黑色实线，标签为边的标签"""
+    w(_EDGE_CFG % (ids[edge.source_node.id], ids[edge.target_node.id], _quote(edge.label if edge.label else '')))
+
+
+def _write_cdg_edge(w, ids: _NodeIds, edge):
+    """写入控制依赖边：根据标签设置不同样式"""
+    if edge.label == 'entry':
+        # 函数入口到普通节点：绿色粗线
+        template = _EDGE_CDG_ENTRY
+    elif edge.label == 'branch':
+        # 函数入口到分支节点：橙色粗线
+        template = _EDGE_CDG_BRANCH
+    else:
+        # 分支控制依赖：蓝色实线
+        template = _EDGE_CDG
+    # 源节点为控制节点，目标节点为被控制节点
+    w(template % (ids[edge.source_node.id], ids[edge.target_node.id]))
+
+
+def _write_ddg_edge(w, ids: _NodeIds, edge):
+    """写入数据依赖边：红色虚线，标签为相关变量"""
+    var_label = ', '.join(edge.token) if hasattr(edge, 'token') and edge.token else ''
+    # 源节点为定义/写入变量的节点，目标节点为使用变量的节点
+    w(_EDGE_DDG % (ids[edge.source_node.id], ids[edge.target_node.id], _quote(var_label)))
+
+
+def _statement_chains(cfg: Graph) -> List[List]:
+    """
+    把CFG中的直线语句序列划分为块，返回按节点顺序排列的块列表（每块为节点列表）
+
+    一条无标签边的前驱是只有这一条出边的普通语句、后继只有这一条入边且不是分支，
+    则后继并入前驱所在的块；函数定义节点和分支节点始终单独成块
+    """
+    out_edges = {}
+    in_degree = {}
+    for edge in cfg.edges:
+        if edge.source_node and edge.target_node:
+            out_edges.setdefault(edge.source_node.id, []).append(edge)
+            in_degree[edge.target_node.id] = in_degree.get(edge.target_node.id, 0) + 1
+
+    # 节点ID -> 同一块中的下一个节点
+    next_node = {}
+    for node in cfg.nodes:
+        edges = out_edges.get(node.id, ())
+        if len(edges) != 1 or node.is_branch or node.type == 'function_definition':
+            continue
+        target = edges[0].target_node
+        if (not edges[0].label and in_degree[target.id] == 1 and not target.is_branch
+                and target.type != 'function_definition' and target.id != node.id):
+            next_node[node.id] = target
+    merged = {target.id for target in next_node.values()}
+
+    chains = []
+    visited = set()
+
+    def follow(node):
+        chain = []
+        while node is not None and node.id not in visited:
+            visited.add(node.id)
+            chain.append(node)
+            node = next_node.get(node.id)
+        chains.append(chain)
+
+    # 先从块首节点出发；剩下的只可能是首尾相接的环，从其中任一节点断开
+    for node in cfg.nodes:
+        if node.id not in merged:
+            follow(node)
+    for node in cfg.nodes:
+        if node.id not in visited:
+            follow(node)
+    return chains
+
+
+def _write_collapsed_cfg(w, ids: _NodeIds, cfg: Graph):
+    """写入合并直线语句序列后的CFG：每块一个节点，块内各语句按行显示"""
+    block_of = {}
+    position = {}
+    for chain in _statement_chains(cfg):
+        head = chain[0]
+        for idx, node in enumerate(chain):
+            block_of[node.id] = head
+            position[node.id] = idx
+        if len(chain) == 1:
+            w(_statement_node(ids, head, root_style=False))
+        else:
+            text = '<BR ALIGN="LEFT"/>'.join(html.escape(node.text) for node in chain)
+            w(_NODE_STATEMENT % (ids[head.id], text, head.line))
+
+    for edge in cfg.edges:
+        if not (edge.source_node and edge.target_node):
+            continue
+        source_id, target_id = edge.source_node.id, edge.target_node.id
+        source, target = block_of[source_id], block_of[target_id]
+        # 块内相邻语句之间的边已由块表示
+        if source is target and position[target_id] == position[source_id] + 1:
+            continue
+        w(_EDGE_CFG % (ids[source.id], ids[target.id], _quote(edge.label if edge.label else '')))
+
+
+def _save_outputs(dot, filename: str, pdf: bool, dot_format: bool, view: bool):
+    """
+    保存.dot文件并（按需）生成PDF文件
+
+    DOT源码只编码一次，.dot文件、缓存键和dot进程输入共用同一份字节串；
+    PDF渲染在后台线程中进行，与.dot文件写入重叠
+    """
+    dot_bytes = dot.source.encode('utf-8')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pdf_future = executor.submit(_render_pdf, dot_bytes, filename, view) if pdf else None
+
+        if dot_format:
+            with open(f"{filename}.dot", 'wb') as f:
+                f.write(dot_bytes)
+
+        if pdf_future is not None:
+            pdf_future.result()
+
+
+def visualize_cfg(cfgs: List[Graph], filename: str = 'CFG', pdf: bool = True, dot_format: bool = True, view: bool = False,
+                  collapse_chains: bool = False):
+    """
+    可视化CFG
+
+    collapse_chains为True时把直线语句序列合并为一个节点（基本块），
+    大函数的节点数显著减少，布局更快、图也更易读
+    """
+    if not _has_nodes(cfgs):
+        return None
+
+    buf = _begin_graph(filename)
+    w = buf.write
+    ids = _NodeIds()
 
     for cfg in cfgs:
-        for node in cfg.nodes:
-            # 对于函数定义，显示完整签名
-            if node.type == 'function_definition':
-                label = f"<{html.escape(node.text)}<SUB>{node.line}</SUB>>"
-                dot.node(str(node.id), label=label, shape='ellipse', style='filled', fillcolor='lightblue')
-            else:
-                # 只显示源代码，不显示节点类型
-                code_label = html.escape(node.text)
-                label = f"<{code_label}<SUB>{node.line}</SUB>>"
-                if node.is_branch:
-                    dot.node(str(node.id), shape='diamond', label=label)
-                else:
-                    dot.node(str(node.id), shape='rectangle', label=label)
+        if collapse_chains:
+            _write_collapsed_cfg(w, ids, cfg)
+            continue
+
+        _write_statement_nodes(w, ids, cfg.nodes, root_style=False)
 
         for edge in cfg.edges:
             if edge.source_node and edge.target_node:
-                source_id = edge.source_node.id
-                target_id = edge.target_node.id
-                label = edge.label if edge.label else ''
-                dot.edge(str(source_id), str(target_id), label=label)
+                _write_cfg_edge(w, ids, edge)
 
-    # 保存.dot文件
-    if dot_format:
-        with open(f"{filename}.dot", 'w') as f:
-            f.write(dot.source)
-
-    # 生成PDF文件
-    if pdf:
-        dot.render(filename, view=view, cleanup=True)
+    dot = _end_graph(buf)
+    _save_outputs(dot, filename, pdf, dot_format, view)
 
     return dot
 
 
 def visualize_ddg(ddgs: List[Graph], filename: str = 'DDG', pdf: bool = True, dot_format: bool = True, view: bool = False):
     """可视化DDG"""
-    dot = Digraph(comment=filename, strict=True)
-    dot.attr(rankdir='TB')
-    dot.attr('node', fontname='Arial')
-    dot.attr('edge', fontname='Arial')
+    if not _has_nodes(ddgs):
+        return None
+
+    buf = _begin_graph(filename)
+    w = buf.write
+    ids = _NodeIds()
 
     for ddg in ddgs:
-        # 添加节点
-        for node in ddg.nodes:
-            # 对于函数定义，显示完整签名
-            if node.type == 'function_definition':
-                label = f"<{html.escape(node.text)}<SUB>{node.line}</SUB>>"
-                dot.node(str(node.id), label=label, shape='ellipse', style='filled', fillcolor='lightblue')
-            else:
-                # 只显示源代码，不显示节点类型
-                code_label = html.escape(node.text)
-                label = f"<{code_label}<SUB>{node.line}</SUB>>"
-                if node.is_branch:
-                    dot.node(str(node.id), shape='diamond', label=label)
-                else:
-                    dot.node(str(node.id), shape='rectangle', label=label)
+        _write_statement_nodes(w, ids, ddg.nodes, root_style=False)
 
         # 添加数据依赖边
         for edge in ddg.edges:
             if edge.type == EdgeType.DDG and edge.source_node and edge.target_node:
-                source_id = edge.source_node.id  # 源节点（定义/写入变量的节点）
-                target_id = edge.target_node.id  # 目标节点（使用变量的节点）
-                var_label = ', '.join(edge.token) if hasattr(edge, 'token') and edge.token else ''
-                dot.edge(str(source_id), str(target_id),
-                        label=var_label, style='dotted', color='red')
-
-    # 保存.dot文件
-    if dot_format:
-        with open(f"{filename}.dot", 'w') as f:
-            f.write(dot.source)
+                _write_ddg_edge(w, ids, edge)
 
-    # 生成PDF文件
-    if pdf:
-        dot.render(filename, view=view, cleanup=True)
+    dot = _end_graph(buf)
+    _save_outputs(dot, filename, pdf, dot_format, view)
 
     return dot
 
 
 def visualize_pdg(pdgs: List[Graph], filename: str = 'PDG', pdf: bool = True, dot_format: bool = True, view: bool = False):
     """可视化PDG"""
-    dot = Digraph(comment=filename, strict=True)
-    dot.attr(rankdir='TB')
-    dot.attr('node', fontname='Arial')
-    dot.attr('edge', fontname='Arial')
+    if not _has_nodes(pdgs):
+        return None
+
+    buf = _begin_graph(filename)
+    w = buf.write
+    ids = _NodeIds()
 
     for pdg in pdgs:
-        # 添加节点
-        for node in pdg.nodes:
-            # 对于函数定义，显示完整签名（作为根节点，特别突出）
-            if node.type == 'function_definition':
-                label = f"<<B>ROOT</B><BR/>{html.escape(node.text)}<SUB>{node.line}</SUB>>"
-                dot.node(str(node.id), label=label, shape='ellipse', style='filled', 
-                        fillcolor='lightgreen', fontsize='14', width='2.0')
-            else:
-                # 只显示源代码，不显示节点类型
-                code_label = html.escape(node.text)
-                label = f"<{code_label}<SUB>{node.line}</SUB>>"
-                if node.is_branch:
-                    dot.node(str(node.id), shape='diamond', label=label, style='filled', fillcolor='yellow')
-                else:
-                    dot.node(str(node.id), shape='rectangle', label=label)
-
-        # 添加边
+        _write_statement_nodes(w, ids, pdg.nodes, root_style=True)
+
         for edge in pdg.edges:
-            if edge.type == EdgeType.DDG and edge.source_node and edge.target_node:
-                # 数据依赖边：红色虚线
-                source_id = edge.source_node.id  # 定义节点
-                target_id = edge.target_node.id  # 使用节点
-                var_label = ', '.join(edge.token) if hasattr(edge, 'token') and edge.token else ''
-                dot.edge(str(source_id), str(target_id),
-                        label=var_label, style='dotted', color='red')
-            elif edge.type == EdgeType.CDG and edge.source_node and edge.target_node:
-                # 控制依赖边：根据标签设置不同样式
-                source_id = edge.source_node.id  # 控制节点
-                target_id = edge.target_node.id  # 被控制节点
-                
-                # 根据边的标签设置不同的样式
-                if edge.label == 'entry':
-                    # 函数入口到普通节点：绿色粗线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='green', style='solid', penwidth='2', 
-                            label='entry')
-                elif edge.label == 'branch':
-                    # 函数入口到分支节点：橙色粗线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='orange', style='solid', penwidth='2', 
-                            label='branch')
-                else:
-                    # 分支控制依赖：蓝色实线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='blue', style='solid', penwidth='1')
-            elif edge.source_node and edge.target_node:
+            if not (edge.source_node and edge.target_node):
+                continue
+            if edge.type == EdgeType.DDG:
+                _write_ddg_edge(w, ids, edge)
+            elif edge.type == EdgeType.CDG:
+                _write_cdg_edge(w, ids, edge)
+            else:
                 # 控制流边：黑色实线
-                source_id = edge.source_node.id
-                target_id = edge.target_node.id
-                label = edge.label if edge.label else ''
-                dot.edge(str(source_id), str(target_id), label=label)
+                _write_cfg_edge(w, ids, edge)
 
-    # 保存.dot文件
-    if dot_format:
-        with open(f"{filename}.dot", 'w') as f:
-            f.write(dot.source)
-
-    # 生成PDF文件
-    if pdf:
-        dot.render(filename, view=view, cleanup=True)
+    dot = _end_graph(buf)
+    _save_outputs(dot, filename, pdf, dot_format, view)
 
     return dot
 
 
 def visualize_cdg(cdgs: List[Graph], filename: str = 'CDG', pdf: bool = True, dot_format: bool = True, view: bool = False):
     """可视化控制依赖图"""
-    dot = Digraph(comment=filename, strict=True)
-    dot.attr(rankdir='TB')
-    dot.attr('node', fontname='Arial')
-    dot.attr('edge', fontname='Arial')
+    if not _has_nodes(cdgs):
+        return None
+
+    buf = _begin_graph(filename)
+    w = buf.write
+    ids = _NodeIds()
 
     for cdg in cdgs:
-        # 添加节点
-        for node in cdg.nodes:
-            # 对于函数定义，显示完整签名（作为根节点，特别突出）
-            if node.type == 'function_definition':
-                label = f"<<B>ROOT</B><BR/>{html.escape(node.text)}<SUB>{node.line}</SUB>>"
-                dot.node(str(node.id), label=label, shape='ellipse', style='filled', 
-                        fillcolor='lightgreen', fontsize='14', width='2.0')
-            else:
-                # 只显示源代码，不显示节点类型
-                code_label = html.escape(node.text)
-                label = f"<{code_label}<SUB>{node.line}</SUB>>"
-                if node.is_branch:
-                    dot.node(str(node.id), shape='diamond', label=label, style='filled', fillcolor='yellow')
-                else:
-                    dot.node(str(node.id), shape='rectangle', label=label)
+        _write_statement_nodes(w, ids, cdg.nodes, root_style=True)
 
         # 添加控制依赖边
         for edge in cdg.edges:
             if edge.type == EdgeType.CDG and edge.source_node and edge.target_node:
-                # 控制依赖边：从控制节点指向依赖节点
-                source_id = edge.source_node.id  # 控制节点
-                target_id = edge.target_node.id  # 被控制节点
-                
-                # 根据边的标签设置不同的样式
-                if edge.label == 'entry':
-                    # 函数入口到普通节点：绿色粗线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='green', style='solid', penwidth='2', 
-                            label='entry')
-                elif edge.label == 'branch':
-                    # 函数入口到分支节点：橙色粗线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='orange', style='solid', penwidth='2', 
-                            label='branch')
-                else:
-                    # 分支控制依赖：蓝色实线
-                    dot.edge(str(source_id), str(target_id), 
-                            color='blue', style='solid', penwidth='1')
-
-    # 保存.dot文件
-    if dot_format:
-        with open(f"{filename}.dot", 'w') as f:
-            f.write(dot.source)
-
-    # 生成PDF文件
-    if pdf:
-        dot.render(filename, view=view, cleanup=True)
+                _write_cdg_edge(w, ids, edge)
+
+    dot = _end_graph(buf)
+    _save_outputs(dot, filename, pdf, dot_format, view)
 
     return dot
@@ -2,14 +2,37 @@
 Python调用提取器
 """
 
+import heapq
+from sys import intern
 from typing import Dict, List, Optional, Set
-from tree_sitter import Language, Parser, Node
+from tree_sitter import Parser, Node
 try:
     from .analysis import DDG
+    from .analysis.base import pruned_kind_ids, traverse_tree
+    from .py_module_extractor import SEPARATOR
 except ImportError:
     from analysis import DDG
-import tree_sitter_c
-import json    
+    from analysis.base import pruned_kind_ids, traverse_tree
+    from py_module_extractor import SEPARATOR
+from io_utils import dumps_json
+
+
+# 调用Python对象的C API函数（集合查找，避免每次调用都重建列表并线性扫描）
+PYTHON_CALL_FUNCTIONS = frozenset((
+    'PyObject_CallObject',
+    'PyObject_CallFunction',
+    'PyObject_CallMethod',
+    'PyObject_Call',
+    'PyObject_CallFunctionObjArgs',
+    'PyObject_CallMethodObjArgs',
+    'PyEval_CallObject',
+    'PyEval_CallFunction',
+    'PyEval_CallMethod'
+))
+
+# 包含Python调用的函数达到该数量时，使用多进程并行构建DDG
+PARALLEL_MIN_FUNCTIONS = 8
+
 
 class PythonCallExtractor:
     """
@@ -25,11 +48,18 @@ class PythonCallExtractor:
     """
     
     def __init__(self):
-        self.c_language = Language(tree_sitter_c.language())
-        self.parser = Parser(self.c_language)
         self.ddg_builder = DDG()
+        # 与DDG构建器共用同一个C语言对象，不再重复加载语法
+        self.c_language = self.ddg_builder.language
+        self.parser = Parser(self.c_language)
+        # 缓存节点类型的符号ID，遍历时用整数比较代替字符串比较
+        self._function_definition_id = self.c_language.id_for_node_kind('function_definition', True)
+        self._call_expression_id = self.c_language.id_for_node_kind('call_expression', True)
+        self._pruned_ids = pruned_kind_ids(self.c_language)
         self.all_functions = {}
         self.file_contents = {}
+        # 语句文本 -> 其中调用的函数名；同一语句常出现在多个调用的上下文中，只解析一次
+        self._stmt_calls_cache: Dict[str, List[str]] = {}
     
     def parse_files(self, file_paths: List[str]) -> Dict:
         """
@@ -42,23 +72,33 @@ class PythonCallExtractor:
         
         parsed_files = {}
         for file_path in file_paths:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                code = f.read()
-            parsed_files[file_path] = code
+            with open(file_path, 'rb') as f:
+                parsed_files[file_path] = f.read()
+        
+        return self.parse_sources(parsed_files)
+    
+    def parse_sources(self, parsed_files: Dict[str, bytes], trees: Optional[Dict] = None) -> Dict:
+        """
+        对已读入内存的C源码执行与 parse_files 相同的两阶段处理
         
+        Args:
+            parsed_files: {file_path: 源码字节串} 字典
+            trees: 可选的 {file_path: 语法树} 字典，与其他提取器共用；
+                已有的语法树直接复用，新解析的写回，同一文件只解析一次
+        """
         self.file_contents = parsed_files
-        self._get_all_functions(parsed_files)
+        self._get_all_functions(parsed_files, trees)
         
         all_calls = self._analyze_all_functions()
         
         return {
             'python_calls': all_calls,
             'total_calls': len(all_calls),
-            'global_functions': list(self.all_functions.keys()),
-            'total_functions': sum(len(funcs) for funcs in self.all_functions.values())
+            'global_functions': list(self.all_functions),
+            'total_functions': sum(map(len, self.all_functions.values()))
         }
     
-    def _get_all_functions(self, parsed_files: Dict[str, str]):
+    def _get_all_functions(self, parsed_files: Dict[str, bytes], trees: Optional[Dict] = None):
         """
         阶段1：获取所有文件中的函数
         
@@ -66,12 +106,17 @@ class PythonCallExtractor:
         这样在分析Python调用时，可以跨文件查找函数定义
         
         Args:
-            parsed_files: {file_path: code} 字典
+            parsed_files: {file_path: 源码字节串} 字典
+            trees: 可选的 {file_path: 语法树} 共享字典
         """
         self.all_functions = {}
         
         for file_path, code in parsed_files.items():
-            tree = self.parser.parse(bytes(code, "utf8"))
+            tree = trees.get(file_path) if trees is not None else None
+            if tree is None:
+                tree = self.parser.parse(code)
+                if trees is not None:
+                    trees[file_path] = tree
             root_node = tree.root_node
             
             functions = self._find_functions(root_node, code)
@@ -104,51 +149,98 @@ class PythonCallExtractor:
         3. 提取调用上下文和相关函数定义
         
         优势：按需构建DDG，避免浪费
+        
+        包含调用的函数较多时，第2、3步（构建DDG，CPU密集）在多进程中并行执行，
+        结果顺序与串行执行相同
+        
+        代码完全相同的函数（宏展开、复制的样板代码）只检查和分析一次，
+        结果按各自的文件和函数名展开
         """
-        all_calls = []
+        candidates = []
+        # 函数代码 -> Python调用节点列表
+        call_nodes_by_code = {}
         
         for func_name, func_infos in self.all_functions.items():
             for func_info in func_infos:
                 func_code = func_info['code']
-                file_path = func_info['file']
                 
-                func_tree = self.parser.parse(bytes(func_code, "utf8"))
-                func_root = func_tree.root_node
+                call_nodes = call_nodes_by_code.get(func_code)
+                if call_nodes is None:
+                    func_tree = self.parser.parse(bytes(func_code, "utf8"))
+                    call_nodes = self._find_python_call_expressions(func_tree.root_node, func_code)
+                    call_nodes_by_code[func_code] = call_nodes
                 
-                call_nodes = self._find_python_call_expressions(func_root, func_code)
-                
-                if not call_nodes:
-                    continue
-                
-                ddg = self.ddg_builder.construct_ddg(func_code)
-                if not ddg:
-                    continue
-                
-                for call_node in call_nodes:
-                    call_info = self._extract_python_call_context(call_node, func_code, ddg, 0)
-                    if call_info:
-                        call_info['file'] = file_path
-                        call_info['containing_function'] = func_name
-                        call_info['function_definitions'] = self._extract_function_definitions_from_global(
-                            call_info['context_statements']
-                        )
-                        all_calls.append(call_info)
+                if call_nodes:
+                    candidates.append((func_name, func_info['file'], func_code, call_nodes))
+        
+        # 每份函数代码只取第一次出现的候选进行分析
+        first_by_code = {}
+        for candidate in candidates:
+            first_by_code.setdefault(candidate[2], candidate)
+        calls_by_code = dict(zip(first_by_code, self._analyze_candidates(list(first_by_code.values()))))
+        
+        all_calls = []
+        for func_name, file_path, func_code, _ in candidates:
+            for call_info in calls_by_code[func_code]:
+                call_info = dict(call_info)
+                call_info['file'] = file_path
+                call_info['containing_function'] = func_name
+                all_calls.append(call_info)
         
         return all_calls
     
+    def _analyze_candidates(self, candidates: List[tuple]) -> List[List[Dict]]:
+        """对每个候选函数构建DDG并提取调用信息，按候选顺序返回各函数的调用列表"""
+        if len(candidates) >= PARALLEL_MIN_FUNCTIONS:
+            # 语法树节点不能跨进程传递：工作进程只接收函数代码并重新解析，
+            # 函数注册表中也只保留可序列化的字段
+            functions = {
+                func_name: [{key: func_info[key] for key in ('function_name', 'file', 'line', 'code')}
+                            for func_info in func_infos]
+                for func_name, func_infos in self.all_functions.items()
+            }
+            tasks = [(func_name, file_path, func_code) for func_name, file_path, func_code, _ in candidates]
+            # multiprocessing 导入较慢，只在实际并行时导入
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(initializer=_init_call_worker, initargs=(functions,)) as executor:
+                return list(executor.map(_analyze_function_in_worker, tasks, chunksize=4))
+        
+        return [self._analyze_function(func_name, file_path, func_code, call_nodes)
+                for func_name, file_path, func_code, call_nodes in candidates]
+    
+    def _analyze_function(self, func_name: str, file_path: str, func_code: str,
+                          call_nodes: List[Node]) -> List[Dict]:
+        """对包含Python C API调用的单个函数构建DDG，提取每个调用的上下文"""
+        ddg = self.ddg_builder.construct_ddg(func_code)
+        if not ddg:
+            return []
+        
+        calls = []
+        for call_node in call_nodes:
+            call_info = self._extract_python_call_context(call_node, func_code, ddg, 0)
+            if call_info:
+                call_info['file'] = file_path
+                call_info['containing_function'] = func_name
+                call_info['function_definitions'] = self._extract_function_definitions_from_global(
+                    call_info['context_statements']
+                )
+                calls.append(call_info)
+        
+        return calls
+    
+    def _traverse_tree(self, node: Node):
+        """先序遍历语法树的节点，跳过字符串、注释、字面量等子树（PRUNED_NODE_TYPES）"""
+        return traverse_tree(node, self._pruned_ids)
+    
     def _find_functions(self, node: Node, code: str) -> List[Node]:
-        functions = []
-        if node.type == 'function_definition':
-            functions.append(node)
-        for child in node.children:
-            functions.extend(self._find_functions(child, code))
-        return functions
+        function_definition_id = self._function_definition_id
+        return [n for n in self._traverse_tree(node) if n.kind_id == function_definition_id]
     
     def _find_python_call_expressions(self, node: Node, code: str) -> List[Node]:
         """
         查找Python C API调用表达式
         
-        递归遍历AST，查找所有Python C API调用节点
+        迭代遍历AST，查找所有Python C API调用节点
         只返回Python相关调用，不包括普通C函数调用
         
         Args:
@@ -159,34 +251,23 @@ class PythonCallExtractor:
             Python C API调用节点列表
         """
         calls = []
-        if node.type == 'call_expression':
-            function_name = self._get_function_name(node, code)
-            if self._is_python_call_function(function_name):
-                calls.append(node)
-        for child in node.children:
-            calls.extend(self._find_python_call_expressions(child, code))
+        call_expression_id = self._call_expression_id
+        for n in self._traverse_tree(node):
+            if n.kind_id == call_expression_id:
+                function_name = self._get_function_name(n, code)
+                if self._is_python_call_function(function_name):
+                    calls.append(n)
         return calls
     
     def _get_function_name(self, call_node: Node, code: str) -> str:
         for child in call_node.children:
             if child.type in ['identifier', 'field_expression']:
-                func_name = child.text.decode('utf-8')
-                return func_name
+                # 函数名在 all_functions 中反复查找，驻留后字典比较可走指针相等的快速路径
+                return intern(child.text.decode('utf-8'))
         return ""
     
     def _is_python_call_function(self, function_name: str) -> bool:
-        python_call_funcs = [
-            'PyObject_CallObject',
-            'PyObject_CallFunction',
-            'PyObject_CallMethod',
-            'PyObject_Call',
-            'PyObject_CallFunctionObjArgs',
-            'PyObject_CallMethodObjArgs',
-            'PyEval_CallObject',
-            'PyEval_CallFunction',
-            'PyEval_CallMethod'
-        ]
-        return function_name in python_call_funcs
+        return function_name in PYTHON_CALL_FUNCTIONS
     
     def _extract_python_call_context(self, call_node: Node, code: str, ddg, func_start_line: int = 0) -> Optional[Dict]:
         """
@@ -241,39 +322,59 @@ class PythonCallExtractor:
         3. 如果包含，添加该语句，并将该语句的所有 def/use 变量加入 vars_to_track
         4. 重复步骤 2-3，直到没有新语句被添加
         """
+        nodes = ddg.nodes
+        node_vars = []
+        # 变量 -> 涉及该变量的语句下标，新增追踪变量时只检查这些语句
+        nodes_by_var = {}
+        for idx, node in enumerate(nodes):
+            defs = ddg.defs.get(node.id, set())
+            uses = ddg.uses.get(node.id, set())
+            all_vars = defs | uses
+            node_vars.append((defs, uses, all_vars))
+            for var in all_vars:
+                nodes_by_var.setdefault(var, []).append(idx)
+        
         vars_to_track = set(initial_vars)
         added_statements = set()
         context = []
         
-        changed = True
-        while changed:
-            changed = False
-            
-            for node in ddg.nodes:
-                node_id = node.id
+        # 按语句顺序逐轮扫描的工作表实现：current 为本轮尚待检查的语句（下标在当前位置之后），
+        # later 为下一轮才会检查到的语句；结果与逐轮遍历全部语句直到不再变化相同
+        current = [idx for var in vars_to_track for idx in nodes_by_var.get(var, ())]
+        later = []
+        done = set()
+        while current:
+            heapq.heapify(current)
+            while current:
+                idx = heapq.heappop(current)
+                if idx in done:
+                    continue
+                done.add(idx)
+                node = nodes[idx]
                 
                 if node.line in added_statements:
                     continue
                 
-                defs = ddg.defs.get(node_id, set())
-                uses = ddg.uses.get(node_id, set())
-                all_vars = defs | uses
+                defs, uses, all_vars = node_vars[idx]
+                context.append({
+                    'line': node.line,
+                    'text': node.text,
+                    'type': node.type,
+                    'defs': defs,
+                    'uses': uses
+                })
+                added_statements.add(node.line)
                 
-                if all_vars & vars_to_track:
-                    context.append({
-                        'line': node.line,
-                        'text': node.text,
-                        'type': node.type,
-                        'defs': defs,
-                        'uses': uses
-                    })
-                    added_statements.add(node.line)
-                    
-                    old_size = len(vars_to_track)
-                    vars_to_track.update(all_vars)
-                    
-                    if len(vars_to_track) > old_size:
-                        changed = True
+                for var in all_vars - vars_to_track:
+                    vars_to_track.add(var)
+                    for other in nodes_by_var[var]:
+                        if other in done:
+                            continue
+                        if other > idx:
+                            heapq.heappush(current, other)
+                        else:
+                            later.append(other)
+            current, later = later, []
         
         context.sort(key=lambda x: x['line'])
         return context
@@ -308,22 +409,25 @@ class PythonCallExtractor:
     
     def _find_function_calls_in_stmt(self, text: str) -> List[str]:
         """
-        从调用语句中提取函数名称
+        从调用语句中提取函数名称（结果按语句文本缓存）
         """
+        cached = self._stmt_calls_cache.get(text)
+        if cached is not None:
+            return cached
+        
         tree = self.parser.parse(bytes(text, "utf8"))
         root = tree.root_node
         
         function_calls = []
+        call_expression_id = self._call_expression_id
         
-        def extract_calls(node):
-            if node.type == 'call_expression':
+        for node in self._traverse_tree(root):
+            if node.kind_id == call_expression_id:
                 func_name = self._get_function_name(node, text)
                 if func_name:
                     function_calls.append(func_name)
-            for child in node.children:
-                extract_calls(child)
         
-        extract_calls(root)
+        self._stmt_calls_cache[text] = function_calls
         return function_calls
     
     def _get_function_name_from_definition(self, func_node: Node, code: str) -> str:
@@ -337,7 +441,7 @@ class PythonCallExtractor:
             if node.type == 'function_declarator':
                 for child in node.children:
                     if child.type == 'identifier':
-                        return child.text.decode('utf-8')
+                        return intern(child.text.decode('utf-8'))
             elif node.type == 'pointer_declarator':
                 for child in node.children:
                     result = extract_from_node(child)
@@ -352,6 +456,24 @@ class PythonCallExtractor:
         return ""
 
 
+# 工作进程内的提取器，由 _init_call_worker 在每个进程中创建一次
+_worker_extractor = None
+
+
+def _init_call_worker(all_functions: Dict[str, List[Dict]]):
+    global _worker_extractor
+    _worker_extractor = PythonCallExtractor()
+    _worker_extractor.all_functions = all_functions
+
+
+def _analyze_function_in_worker(task) -> List[Dict]:
+    func_name, file_path, func_code = task
+    extractor = _worker_extractor
+    func_root = extractor.parser.parse(bytes(func_code, "utf8")).root_node
+    call_nodes = extractor._find_python_call_expressions(func_root, func_code)
+    return extractor._analyze_function(func_name, file_path, func_code, call_nodes)
+
+
 def format_call_info_json(result: Dict) -> str:
     """
     格式化输出Python C API调用的完整上下文（JSON格式）
@@ -380,7 +502,8 @@ def format_call_info_json(result: Dict) -> str:
             ]
         }
         
-        if call.get('function_definitions'):
+        function_definitions = call.get('function_definitions')
+        if function_definitions:
             call_entry["function_definitions"] = [
                 {
                     "type": "Helper_Function",
@@ -389,13 +512,33 @@ def format_call_info_json(result: Dict) -> str:
                     "line": func_def.get('line', 0),
                     "file": func_def.get('file', '')
                 }
-                for func_def in call['function_definitions']
+                for func_def in function_definitions
             ]
         
         formatted_calls.append(call_entry)
     
     output = {"python_api_calls": formatted_calls}
-    return json.dumps(output, indent=2, ensure_ascii=False)
+    return dumps_json(output).decode('utf-8')
+
+
+def _iter_call_info_lines(python_calls: List[Dict]):
+    """逐行生成format_call_info_text的输出内容"""
+    for i, call in enumerate(python_calls, 1):
+        yield ""
+        yield SEPARATOR
+        yield f"C中的Python API调用 #{i}"
+        yield SEPARATOR
+        yield ""
+        
+        context_statements = call.get('context_statements')
+        if context_statements:
+            for stmt in context_statements:
+                yield stmt['text']
+            yield ""
+        
+        for func_def in call.get('function_definitions') or ():
+            yield func_def['code']
+            yield ""
 
 
 def format_call_info_text(result: Dict) -> str:
@@ -403,27 +546,20 @@ def format_call_info_text(result: Dict) -> str:
     格式化输出Python C API调用的完整代码片段（文本格式）
     格式与模块注册保持一致，使用分隔线和标题
     """
-    lines = []
-    python_calls = result.get('python_calls', [])
-    
-    for i, call in enumerate(python_calls, 1):
-        lines.append("")
-        lines.append("=" * 80)
-        lines.append(f"C中的Python API调用 #{i}")
-        lines.append("=" * 80)
-        lines.append("")
-        
-        if call.get('context_statements'):
-            for stmt in call['context_statements']:
-                lines.append(stmt['text'])
-            lines.append("")
-        
-        if call.get('function_definitions'):
-            for func_def in call['function_definitions']:
-                lines.append(func_def['code'])
-                lines.append("")
-    
-    return "\n".join(lines)
+    return "\n".join(_iter_call_info_lines(result.get('python_calls', [])))
+
+
+
+def write_call_info_text(result: Dict, f):
+    """
+    与format_call_info_text输出相同，但逐行写入文件对象，不在内存中拼接完整文本
+    """
+    lines = _iter_call_info_lines(result.get('python_calls', []))
+    write = f.write
+    write(next(lines, ''))
+    for line in lines:
+        write('\n')
+        write(line)
 
 
 if __name__ == '__main__':
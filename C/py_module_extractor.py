@@ -3,16 +3,45 @@ C代码解析器
 使用tree-sitter解析C代码，提取Python模块注册相关代码
 """
 
+import re
+import sys
+import hashlib
+from pathlib import Path
 from typing import Dict, List, Optional
 from tree_sitter import Language, Parser
 import tree_sitter_c
-import json
+try:
+    from .analysis.base import pruned_kind_ids, traverse_tree
+except ImportError:
+    # 作为脚本运行时项目根目录不在 sys.path 中，共用的 io_utils 位于根目录
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from analysis.base import pruned_kind_ids, traverse_tree
+from io_utils import dumps_json
+
+
+# 模块注册链匹配用的正则，导入时编译一次
+# PyModule_Create(&VariableName) -> PyModuleDef变量名
+MODULE_CREATE_RE = re.compile(r'PyModule_Create\s*\(\s*&\s*(\w+)\s*\)')
+# {PyModuleDef_HEAD_INIT, "name", NULL, -1, MethodsName} -> 最后一个逗号后、右花括号前的标识符
+MODULE_DEF_METHODS_RE = re.compile(r',\s*(\w+)\s*\}')
+# 指定字段的写法 .m_methods = MethodsName
+MODULE_DEF_M_METHODS_RE = re.compile(r'\.m_methods\s*=\s*(\w+)')
+# {"python_name", c_function_name, METH_...} -> C函数名；函数名前可以有类型转换，如 (PyCFunction)func
+METHOD_ENTRY_RE = re.compile(r'\{\s*"[^"]+"\s*,\s*(?:\([^"{},]*\)\s*)?(\w+)\s*,\s*METH_')
+
+
+# 文件数达到该值时使用多进程并行解析（进程启动有固定开销，文件少时串行更快）
+PARALLEL_MIN_FILES = 16
+
+# 文本输出中各条记录之间的分隔线（调用提取器和 main.py 的控制台输出也使用）
+SEPARATOR = "=" * 80
 
 
 class CCodeParser:
     def __init__(self):
         self.c_language = Language(tree_sitter_c.language())
         self.parser = Parser(self.c_language)
+        self._pruned_ids = pruned_kind_ids(self.c_language)
     
     def parse_files(self, file_paths: List[str]) -> Dict:
         """
@@ -27,27 +56,75 @@ class CCodeParser:
         if isinstance(file_paths, str):
             file_paths = [file_paths]
         
-        all_results = []
+        # 直接读取原始字节交给tree-sitter，省去一次解码和重新编码
+        sources = {}
         for file_path in file_paths:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                code = f.read()
-            result = self._parse_single_code(code, file_path)
-            all_results.append(result)
+            with open(file_path, 'rb') as f:
+                sources[file_path] = f.read()
         
-        return self._merge_results(all_results)
+        return self.parse_sources(sources)
+    
+    def parse_sources(self, sources: Dict[str, bytes], trees: Optional[Dict] = None,
+                      file_cache: Optional[Dict] = None) -> Dict:
+        """
+        解析已读入内存的C源码并合并提取Python模块注册信息
+        
+        Args:
+            sources: {文件路径: 源码字节串}
+            trees: 可选的 {文件路径: 语法树} 字典，与其他提取器共用；
+                已有的语法树直接复用，新解析的写回，同一文件只解析一次
+            file_cache: 可选的单文件解析结果缓存 {文件路径: (内容哈希, 解析结果)}；
+                内容未变化的文件直接使用缓存结果，其余文件解析后写回
+            
+        Returns:
+            Dict: 合并后的Python模块注册信息
+        """
+        # 单文件的组件提取只依赖该文件内容，跨文件的链路在合并时构建，
+        # 因此只需重新解析内容有变化的文件
+        results = {}
+        digests = {}
+        if file_cache is not None:
+            for file_path, code in sources.items():
+                digest = digests[file_path] = hashlib.blake2b(code, digest_size=16).digest()
+                cached = file_cache.get(file_path)
+                if cached is not None and cached[0] == digest:
+                    results[file_path] = cached[1]
+        pending = {file_path: code for file_path, code in sources.items() if file_path not in results}
+        
+        # 各文件的解析相互独立，文件较多时分发到多个进程；map 保持文件顺序
+        if len(pending) >= PARALLEL_MIN_FILES:
+            # multiprocessing 导入较慢，只在实际并行时导入
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor() as executor:
+                results.update(zip(pending, executor.map(_parse_source_in_worker, pending.items(), chunksize=8)))
+        else:
+            for file_path, code in pending.items():
+                tree = trees.get(file_path) if trees is not None else None
+                if tree is None:
+                    tree = self.parser.parse(code)
+                    if trees is not None:
+                        trees[file_path] = tree
+                results[file_path] = self._parse_single_code(code, file_path, tree)
+        
+        if file_cache is not None:
+            for file_path in pending:
+                file_cache[file_path] = (digests[file_path], results[file_path])
+        
+        return self._merge_results([results[file_path] for file_path in sources])
     
-    def _parse_single_code(self, code: str, file_path: str) -> Dict:
+    def _parse_single_code(self, code: bytes, file_path: str, tree=None) -> Dict:
         """
         解析单个C代码并提取组件（不构建链路）
         
         Args:
-            code: C代码字符串
+            code: C代码的UTF-8字节串
             file_path: 文件路径
             
         Returns:
             Dict: 包含提取的组件
         """
-        tree = self.parser.parse(bytes(code, "utf8"))
+        if tree is None:
+            tree = self.parser.parse(code)
         root_node = tree.root_node
         
         result = {
@@ -69,8 +146,6 @@ class CCodeParser:
         Returns:
             Dict: 合并后的结果
         """
-        import re
-        
         merged = {
             'py_method_defs': [],
             'py_module_defs': [],
@@ -99,24 +174,23 @@ class CCodeParser:
                 'c_functions': []
             }
             
-            module_def_pattern = r'PyModule_Create\s*\(\s*&\s*(\w+)\s*\)'
-            match = re.search(module_def_pattern, init_func['code'])
+            match = MODULE_CREATE_RE.search(init_func['code'])
             module_def_name = match.group(1) if match else None
             
             if module_def_name and module_def_name in module_def_map:
                 module_def = module_def_map[module_def_name]
                 chain['module_def_info'] = module_def
                 
-                method_def_pattern = r',\s*(\w+)\s*\}'
-                matches = re.findall(method_def_pattern, module_def['code'])
+                # 指定字段的写法取 .m_methods 的值，否则取按位置写法中最后一个字段
+                matches = (MODULE_DEF_M_METHODS_RE.findall(module_def['code'])
+                           or MODULE_DEF_METHODS_RE.findall(module_def['code']))
                 method_def_name = matches[-1] if matches else None
                 
                 if method_def_name and method_def_name in method_def_map:
                     method_def = method_def_map[method_def_name]
                     chain['method_def_info'] = method_def
                     
-                    func_pattern = r'\{\s*"[^"]+"\s*,\s*(\w+)\s*,\s*METH_'
-                    func_matches = re.findall(func_pattern, method_def['code'])
+                    func_matches = METHOD_ENTRY_RE.findall(method_def['code'])
                     
                     for func_name in func_matches:
                         if func_name in c_function_map:
@@ -129,7 +203,7 @@ class CCodeParser:
         
         return merged
     
-    def _extract_py_method_defs(self, root_node, code: str, file_path: str) -> List[Dict]:
+    def _extract_py_method_defs(self, root_node, code: bytes, file_path: str) -> List[Dict]:
         """提取PyMethodDef数组定义"""
         method_defs = []
         
@@ -137,7 +211,7 @@ class CCodeParser:
         for node in self._traverse_tree(root_node):
             if node.type == 'declaration':
                 # 检查是否是PyMethodDef类型
-                decl_text = code[node.start_byte:node.end_byte]
+                decl_text = self._get_node_text(node, code)
                 if 'PyMethodDef' in decl_text:
                     # 提取变量名
                     var_name = self._extract_variable_name(node, code)
@@ -155,13 +229,13 @@ class CCodeParser:
         
         return method_defs
     
-    def _extract_py_module_defs(self, root_node, code: str, file_path: str) -> List[Dict]:
+    def _extract_py_module_defs(self, root_node, code: bytes, file_path: str) -> List[Dict]:
         """提取PyModuleDef结构定义"""
         module_defs = []
         
         for node in self._traverse_tree(root_node):
             if node.type == 'declaration':
-                decl_text = code[node.start_byte:node.end_byte]
+                decl_text = self._get_node_text(node, code)
                 if 'PyModuleDef' in decl_text:
                     var_name = self._extract_variable_name(node, code)
                     
@@ -178,13 +252,13 @@ class CCodeParser:
         
         return module_defs
     
-    def _extract_py_init_funcs(self, root_node, code: str, file_path: str) -> List[Dict]:
+    def _extract_py_init_funcs(self, root_node, code: bytes, file_path: str) -> List[Dict]:
         """提取PyInit_*函数定义"""
         init_funcs = []
         
         for node in self._traverse_tree(root_node):
             if node.type == 'function_definition':
-                func_text = code[node.start_byte:node.end_byte]
+                func_text = self._get_node_text(node, code)
                 func_name = self._extract_function_name(node, code)
                 
                 # 检查是否是PyInit_开头的函数或包含PyMODINIT_FUNC
@@ -208,21 +282,18 @@ class CCodeParser:
         
         PyMethodDef格式: {"python_name", c_function_name, METH_VARARGS, "doc"}
         """
-        import re
-        
         func_names = set()
         
         for method_def in py_method_defs:
             method_code = method_def['code']
             # 匹配 {"name", func_name, ...} 格式
             # 查找所有类似 {"...", identifier, METH_...} 的模式
-            pattern = r'\{\s*"[^"]+"\s*,\s*(\w+)\s*,\s*METH_'
-            matches = re.findall(pattern, method_code)
+            matches = METHOD_ENTRY_RE.findall(method_code)
             func_names.update(matches)
         
         return func_names
     
-    def _extract_all_py_c_functions(self, root_node, code: str, file_path: str) -> List[Dict]:
+    def _extract_all_py_c_functions(self, root_node, code: bytes, file_path: str) -> List[Dict]:
         """
         提取所有符合Python/C API签名的函数
         """
@@ -230,17 +301,18 @@ class CCodeParser:
         
         for node in self._traverse_tree(root_node):
             if node.type == 'function_definition':
-                func_text = code[node.start_byte:node.end_byte]
-                func_name = self._extract_function_name(node, code)
-                
                 # 检查是否符合Python C API签名
                 # 1. 返回类型是 PyObject *
                 # 2. 参数是 (PyObject *self, PyObject *args) 或类似形式
-                if func_name and self._is_python_c_api_function(node, code):
+                # 先做廉价的签名检查，不符合的函数无需解码全文和提取函数名
+                if not self._is_python_c_api_function(node, code):
+                    continue
+                func_name = self._extract_function_name(node, code)
+                if func_name:
                     c_functions.append({
                         'type': 'Python_C_Function',
                         'name': func_name,
-                        'code': func_text,
+                        'code': self._get_node_text(node, code),
                         'file_path': file_path,
                         'start_line': node.start_point[0] + 1,
                         'end_line': node.end_point[0] + 1,
@@ -250,7 +322,7 @@ class CCodeParser:
         
         return c_functions
     
-    def _is_python_c_api_function(self, function_node, code: str) -> bool:
+    def _is_python_c_api_function(self, function_node, code: bytes) -> bool:
         """
         检查函数是否符合Python C API签名
         
@@ -258,10 +330,11 @@ class CCodeParser:
         - static PyObject *func_name(PyObject *self, PyObject *args)
         - PyObject *func_name(PyObject *self, PyObject *args)
         """
-        func_text = code[function_node.start_byte:function_node.end_byte]
-        
-        # 检查返回类型是否包含 PyObject
-        if 'PyObject' not in func_text[:200]:  # 只检查函数开头
+        # 检查返回类型是否包含 PyObject：只检查函数开头200个字符，
+        # UTF-8每个字符最多4字节，只解码前800字节即可，无需解码整个函数
+        start = function_node.start_byte
+        func_head = code[start:min(function_node.end_byte, start + 800)].decode('utf-8', errors='ignore')
+        if 'PyObject' not in func_head[:200]:
             return False
         
         # 检查参数列表
@@ -276,11 +349,11 @@ class CCodeParser:
         
         return False
     
-    def _check_parameter_list(self, declarator_node, code: str) -> bool:
+    def _check_parameter_list(self, declarator_node, code: bytes) -> bool:
         """检查参数列表是否符合Python C API格式"""
         for child in declarator_node.children:
             if child.type == 'parameter_list':
-                param_text = code[child.start_byte:child.end_byte]
+                param_text = self._get_node_text(child, code)
                 # 检查是否包含两个 PyObject 参数
                 # 典型形式: (PyObject *self, PyObject *args)
                 if param_text.count('PyObject') >= 2:
@@ -297,8 +370,6 @@ class CCodeParser:
         Returns:
             List[Dict]: 每个字典包含一个完整的注册链路
         """
-        import re
-        
         chains = []
         
         # 为每个PyInit函数构建链路
@@ -315,8 +386,7 @@ class CCodeParser:
             
             # 从PyInit函数中提取PyModuleDef变量名
             # 匹配 PyModule_Create(&VariableName) 或 PyModule_Create(&VariableName)
-            module_def_pattern = r'PyModule_Create\s*\(\s*&\s*(\w+)\s*\)'
-            match = re.search(module_def_pattern, init_func['code'])
+            match = MODULE_CREATE_RE.search(init_func['code'])
             
             if match:
                 module_def_name = match.group(1)
@@ -330,8 +400,7 @@ class CCodeParser:
                         # 从PyModuleDef中提取PyMethodDef变量名
                         # PyModuleDef格式: {PyModuleDef_HEAD_INIT, "name", NULL, -1, MethodsName}
                         # 提取最后一个逗号后、右花括号前的标识符
-                        method_def_pattern = r',\s*(\w+)\s*\}'
-                        matches = re.findall(method_def_pattern, module_def['code'])
+                        matches = MODULE_DEF_METHODS_RE.findall(module_def['code'])
                         
                         if matches:
                             method_def_name = matches[-1]
@@ -359,22 +428,15 @@ class CCodeParser:
         
         return chains
     
+    def _get_node_text(self, node, code: bytes) -> str:
+        """按字节偏移截取节点对应的源码文本"""
+        return code[node.start_byte:node.end_byte].decode('utf-8', errors='ignore')
+    
     def _traverse_tree(self, node):
-        """遍历语法树的所有节点"""
-        cursor = node.walk()
-        
-        visited_children = False
-        while True:
-            if not visited_children:
-                yield cursor.node
-                if not cursor.goto_first_child():
-                    visited_children = True
-            elif cursor.goto_next_sibling():
-                visited_children = False
-            elif not cursor.goto_parent():
-                break
+        """先序遍历语法树的节点，跳过字符串、注释、字面量等子树（PRUNED_NODE_TYPES）"""
+        return traverse_tree(node, self._pruned_ids)
     
-    def _extract_variable_name(self, declaration_node, code: str) -> Optional[str]:
+    def _extract_variable_name(self, declaration_node, code: bytes) -> Optional[str]:
         """从声明节点中提取变量名"""
         for child in declaration_node.children:
             if child.type == 'init_declarator':
@@ -382,31 +444,43 @@ class CCodeParser:
                     if subchild.type == 'array_declarator':
                         for identifier_node in subchild.children:
                             if identifier_node.type == 'identifier':
-                                return code[identifier_node.start_byte:identifier_node.end_byte]
+                                return self._get_node_text(identifier_node, code)
                     elif subchild.type == 'identifier':
-                        return code[subchild.start_byte:subchild.end_byte]
+                        return self._get_node_text(subchild, code)
             elif child.type == 'identifier':
-                return code[child.start_byte:child.end_byte]
+                return self._get_node_text(child, code)
         return None
     
-    def _extract_function_name(self, function_node, code: str) -> Optional[str]:
+    def _extract_function_name(self, function_node, code: bytes) -> Optional[str]:
         """从函数定义节点中提取函数名"""
         for child in function_node.children:
             if child.type == 'function_declarator':
                 for subchild in child.children:
                     if subchild.type == 'identifier':
-                        return code[subchild.start_byte:subchild.end_byte]
+                        return self._get_node_text(subchild, code)
             elif child.type == 'pointer_declarator':
                 # 处理指针返回类型的函数，如 PyObject *func_name(...)
                 for subchild in child.children:
                     if subchild.type == 'function_declarator':
                         for identifier_node in subchild.children:
                             if identifier_node.type == 'identifier':
-                                return code[identifier_node.start_byte:identifier_node.end_byte]
+                                return self._get_node_text(identifier_node, code)
         return None
 
 
 
+# 工作进程内的解析器，每个进程首次使用时创建
+_worker_parser = None
+
+
+def _parse_source_in_worker(source) -> Dict:
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = CCodeParser()
+    file_path, code = source
+    return _worker_parser._parse_single_code(code, file_path)
+
+
 def format_registration_info(result: Dict, verbose: bool = True) -> str:
     """
     格式化输出注册信息（简化版，适合LLM使用）
@@ -482,7 +556,28 @@ def format_registration_info_json(result: Dict) -> str:
     json_data = {
         "module_chains": result.get('module_chains', [])
     }
-    return json.dumps(json_data, indent=2, ensure_ascii=False)
+    return dumps_json(json_data).decode('utf-8')
+
+
+def _iter_registration_text_lines(module_chains: List[Dict]):
+    """逐行生成format_registration_info_text的输出内容"""
+    for idx, chain in enumerate(module_chains, 1):
+        yield ""
+        yield SEPARATOR
+        yield f"C中的python注册模块 #{idx}"
+        yield SEPARATOR
+        yield ""
+        
+        # 每个字段只取一次
+        for key in ('init_function_info', 'module_def_info', 'method_def_info'):
+            info = chain.get(key)
+            if info:
+                yield info['code']
+                yield ""
+        
+        for func in chain.get('c_functions') or ():
+            yield func['code']
+            yield ""
 
 
 def format_registration_info_text(result: Dict) -> str:
@@ -496,31 +591,20 @@ def format_registration_info_text(result: Dict) -> str:
     Returns:
         str: 文本格式的字符串
     """
-    lines = []
-    
-    if result.get('module_chains'):
-        for idx, chain in enumerate(result['module_chains'], 1):
-            lines.append("")
-            lines.append("=" * 80)
-            lines.append(f"C中的python注册模块 #{idx}")
-            lines.append("=" * 80)
-            lines.append("")
-            
-            if chain.get('init_function_info'):
-                lines.append(f"{chain['init_function_info']['code']}")
-                lines.append("")
-            
-            if chain.get('module_def_info'):
-                lines.append(f"{chain['module_def_info']['code']}")
-                lines.append("")
-            
-            if chain.get('method_def_info'):
-                lines.append(f"{chain['method_def_info']['code']}")
-                lines.append("")
-            
-            if chain.get('c_functions'):
-                for func in chain['c_functions']:
-                    lines.append(f"{func['code']}")
-                    lines.append("")
+    return "\n".join(_iter_registration_text_lines(result.get('module_chains') or []))
+
+
+def write_registration_info_text(result: Dict, f):
+    """
+    与format_registration_info_text输出相同，但逐行写入文件对象，不在内存中拼接完整文本
     
-    return "\n".join(lines)
\ No newline at end of file
+    Args:
+        result: parse_files返回的结果
+        f: 以文本模式打开的文件对象
+    """
+    lines = _iter_registration_text_lines(result.get('module_chains') or [])
+    write = f.write
+    write(next(lines, ''))
+    for line in lines:
+        write('\n')
+        write(line)
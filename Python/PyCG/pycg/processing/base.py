@@ -25,6 +25,16 @@ from pycg import utils
 from pycg.machinery.definitions import Definition
 
 
+# Parsed modules keyed by (filename, contents). Every pass, and every
+# PostProcessor iteration, re-parses the same modules; the visitors only read
+# the tree, so one parse per module is shared by all of them.
+_ast_cache = {}
+
+
+def clear_ast_cache():
+    _ast_cache.clear()
+
+
 class ProcessingBase(ast.NodeVisitor):
     def __init__(self, filename, modname, modules_analyzed):
         self.modname = modname
@@ -41,6 +51,13 @@ class ProcessingBase(ast.NodeVisitor):
         self.method_stack = []
         self.last_called_names = None
 
+    def parse_contents(self):
+        key = (self.filename, self.contents)
+        tree = _ast_cache.get(key)
+        if tree is None:
+            tree = _ast_cache[key] = ast.parse(self.contents, self.filename)
+        return tree
+
     def get_modules_analyzed(self):
         return self.modules_analyzed
 
@@ -196,7 +196,7 @@ class CallGraphProcessor(ProcessingBase):
         )
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.parse_contents())
         self.analyze_submodules()
 
     def get_all_reachable_functions(self):
@@ -18,13 +18,16 @@
 # specific language governing permissions and limitations
 # under the License.
 #
-import ast
 import os
 import re
 
 from pycg import utils
 from pycg.processing.base import ProcessingBase
 
+# a dict literal anywhere in the name; searched directly instead of being
+# wrapped in ".*...*" and matched, which backtracks over long namespaces
+DICT_NAME_RE = re.compile(r"<dict[0-9]+>")
+
 
 class KeyErrProcessor(ProcessingBase):
     def __init__(
@@ -73,7 +76,7 @@ class KeyErrProcessor(ProcessingBase):
                 )
 
     def is_subscriptable(self, name):
-        if re.match(r".*<dict[0-9]+>.*", name):
+        if DICT_NAME_RE.search(name):
             return True
 
         return False
@@ -90,7 +93,7 @@ class KeyErrProcessor(ProcessingBase):
         )
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.parse_contents())
         self.analyze_submodules()
 
     def visit_Lambda(self, node):
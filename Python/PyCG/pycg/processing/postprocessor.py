@@ -338,5 +338,5 @@ class PostProcessor(ProcessingBase):
         )
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.parse_contents())
         self.analyze_submodules()
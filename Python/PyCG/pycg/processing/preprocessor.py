@@ -421,4 +421,4 @@ class PreProcessor(ProcessingBase):
             self.import_manager.create_node(self.modname)
             self.import_manager.set_filepath(self.modname, self.filename)
 
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.parse_contents())
@@ -28,6 +28,7 @@ from pycg.machinery.imports import ImportManager
 from pycg.machinery.key_err import KeyErrors
 from pycg.machinery.modules import ModuleManager
 from pycg.machinery.scopes import ScopeManager
+from pycg.processing.base import clear_ast_cache
 from pycg.processing.cgprocessor import CallGraphProcessor
 from pycg.processing.keyerrprocessor import KeyErrProcessor
 from pycg.processing.postprocessor import PostProcessor
@@ -159,6 +160,12 @@ class CallGraphGenerator(object):
                     self.remove_import_hooks()
 
     def analyze(self):
+        try:
+            self._analyze()
+        finally:
+            clear_ast_cache()
+
+    def _analyze(self):
         self.do_pass(
             PreProcessor,
             True,
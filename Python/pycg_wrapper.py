@@ -5,7 +5,11 @@ PyCG 包装器
 
 import sys
 import os
-from typing import Dict, Any, List, Optional
+from collections.abc import Mapping
+from heapq import merge
+from itertools import groupby
+from sys import intern
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
 # 添加 PyCG 到 Python 路径
 PYCG_PATH = os.path.join(os.path.dirname(__file__), 'PyCG')
@@ -17,6 +21,53 @@ from pycg import formats
 from pycg.utils.constants import CALL_GRAPH_OP, KEY_ERR_OP
 
 
+def _standard_name(namespace: str) -> Tuple[Optional[str], str]:
+    """
+    FASTEN 命名空间 -> (模块, 标准函数名)
+    
+    格式: //module//function 或 //module//module.function，如 //.builtin//print -> <builtin>.print；
+    其他格式（内部函数）返回 (None, 原命名空间)
+    """
+    if '//' not in namespace:
+        return None, namespace
+    
+    parts = namespace.split('//')
+    module = parts[1]
+    func_name = parts[2] if len(parts) > 2 else ''
+    
+    # 处理函数名（可能包含模块前缀），如 host.tick，去掉模块前缀
+    if func_name and '.' in func_name:
+        func_name = func_name.split('.')[-1]
+    
+    if module == '.builtin':
+        full_name = f'<builtin>.{func_name}' if func_name else '<builtin>'
+    else:
+        full_name = f'{module}.{func_name}' if func_name else module
+    return module, full_name
+
+
+class _LazyStats(Mapping):
+    """惰性统计信息：每一项在首次访问时才计算并缓存，dict(stats) 可得到完整字典"""
+    
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        self._fs = factories
+        self._cache = {}
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._cache:
+            self._cache[key] = self._fs[key]()
+        return self._cache[key]
+    
+    def __iter__(self):
+        return iter(self._fs)
+    
+    def __len__(self) -> int:
+        return len(self._fs)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class PyCGWrapper:
     """PyCG 包装器，提供简单的接口来生成调用图"""
     
@@ -126,7 +177,8 @@ class PyCGWrapper:
     
     def get_external_calls(self, include_builtin: bool = True,
                           product: str = "", forge: str = "PyPI",
-                          version: str = "0.1.0", timestamp: int = 0) -> Dict[str, Any]:
+                          version: str = "0.1.0", timestamp: int = 0,
+                          fasten_cg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         获取所有外部调用信息（基于 FASTEN 格式，更精确）
         
@@ -138,6 +190,8 @@ class PyCGWrapper:
             forge: 来源（用于 FASTEN 格式）
             version: 版本号（用于 FASTEN 格式）
             timestamp: 时间戳（用于 FASTEN 格式）
+            fasten_cg: 可选的已由 get_fasten_call_graph 生成的调用图；提供时直接使用（只读），
+                       不再重新生成，此时 product/forge/version/timestamp 不起作用
             
         Returns:
             Dict: 完整的外部调用信息
@@ -145,16 +199,14 @@ class PyCGWrapper:
                     'undefined_functions': [函数名列表],
                     'callers': {函数名: [调用者列表]},
                     'by_module': {模块: [函数列表]},
-                    'statistics': {统计信息},
-                    'call_edges': [(caller, callee), ...],
+                    'statistics': {统计信息（惰性映射，dict() 可转为普通字典）},
+                    'call_edges': {'callers': [caller, ...], 'callees': [callee, ...]},
                     'fasten_details': {FASTEN格式的详细信息}
                 }
         """
-        if self.cg is None:
-            raise RuntimeError("需要先调用 analyze() 方法进行分析")
-        
-        # 获取 FASTEN 格式的调用图
-        fasten_cg = self.get_fasten_call_graph(product, forge, version, timestamp)
+        # 获取 FASTEN 格式的调用图；调用方已生成（或从缓存读取）时复用，此时无需先调用 analyze()
+        if fasten_cg is None:
+            fasten_cg = self.get_fasten_call_graph(product, forge, version, timestamp)
         
         # 提取模块信息
         external_modules_raw = fasten_cg.get('modules', {}).get('external', {})
@@ -172,115 +224,113 @@ class PyCGWrapper:
         for module_uri, module_info in internal_modules.items():
             namespaces = module_info.get('namespaces', {})
             for node_id, ns_info in namespaces.items():
-                namespace = ns_info.get('namespace', '')
-                id_to_func[node_id] = namespace
+                id_to_func[node_id] = ns_info.get('namespace', '')
         
         # 处理外部模块，提取函数名
-        external_functions_list = []  # 外部函数名列表
         by_module = {}  # 按模块分组
         
+        # 命名空间 -> (模块, 标准函数名)；同一命名空间在节点和调用边中反复出现，只转换一次。
+        # 同名字符串在调用边/映射中大量重复，驻留后共享同一对象
+        standard_names = {}
+        
+        def standard_name(namespace: str) -> Tuple[Optional[str], str]:
+            names = standard_names.get(namespace)
+            if names is None:
+                module, full_name = _standard_name(namespace)
+                names = standard_names[namespace] = (module, intern(full_name))
+            return names
+        
+        # 热循环中使用局部绑定，避免重复的属性查找
+        by_module_setdefault = by_module.setdefault
+        
         for module_name, module_info in external_modules_raw.items():
             namespaces = module_info.get('namespaces', {})
             for node_id, ns_info in namespaces.items():
                 namespace = ns_info.get('namespace', '')
                 id_to_func[node_id] = namespace
                 
-                # 提取函数名（从 namespace 中）
-                if '//' in namespace:
-                    # 格式: //module//function 或 //module//module.function
-                    parts = namespace.split('//')
-                    if len(parts) >= 2:
-                        module = parts[1]
-                        func_name = parts[2] if len(parts) > 2 else ''
-                        
-                        # 处理函数名（可能包含模块前缀）
-                        if func_name and '.' in func_name:
-                            # 如 host.tick，去掉模块前缀
-                            func_name = func_name.split('.')[-1]
-                        
-                        # 构建完整的函数名
-                        if module == '.builtin':
-                            full_name = f'<builtin>.{func_name}' if func_name else '<builtin>'
-                        else:
-                            full_name = f'{module}.{func_name}' if func_name else module
-                        
-                        external_functions_list.append(full_name)
-                        
-                        # 按模块分组
-                        if module not in by_module:
-                            by_module[module] = []
-                        if full_name not in by_module[module]:
-                            by_module[module].append(full_name)
+                # 提取函数名（从 namespace 中），按模块分组
+                module, full_name = standard_name(namespace)
+                if module is not None:
+                    module_bucket = by_module_setdefault(module, [])
+                    if full_name not in module_bucket:
+                        module_bucket.append(full_name)
+        
+        # PyCG 分配的节点ID顺序依赖集合遍历顺序，排序后输出与运行无关；
+        # 各模块列表有序后，归并即可得到去重且有序的外部函数列表，无需再建集合
+        for module_bucket in by_module.values():
+            module_bucket.sort()
+        undefined_functions = [name for name, _ in groupby(merge(*by_module.values()))]
         
         # 过滤内置函数（如果需要）
         if not include_builtin:
-            external_functions_list = [f for f in external_functions_list 
-                                       if not f.startswith('<builtin>.')]
+            undefined_functions = [f for f in undefined_functions 
+                                   if not f.startswith('<builtin>.')]
             # 也从 by_module 中移除内置模块
             by_module = {k: v for k, v in by_module.items() 
                         if k != '.builtin'}
         
-        # 解析外部调用，构建调用边和调用者映射
-        call_edges = []
-        callers_map = {}
+        # 解析外部调用，先收集 (调用者, 被调用者) 对，排序后再构建调用边和调用者映射
+        edges = []
         
-        for call in external_calls_raw:
-            caller_id = str(call[0])
-            callee_id = str(call[1])
-            caller_name = id_to_func.get(caller_id, f"node_{caller_id}")
-            callee_name = id_to_func.get(callee_id, f"node_{callee_id}")
+        id_to_func_get = id_to_func.get
+        edges_append = edges.append
+        
+        for caller, callee, *_ in external_calls_raw:
+            caller_id = str(caller)
+            callee_id = str(callee)
+            caller_name = intern(id_to_func_get(caller_id, f"node_{caller_id}"))
+            callee_name = id_to_func_get(callee_id, f"node_{callee_id}")
             
             # 转换 callee_name 为标准格式
-            if '//' in callee_name:
-                parts = callee_name.split('//')
-                if len(parts) >= 2:
-                    module = parts[1]
-                    func_name = parts[2] if len(parts) > 2 else ''
-                    
-                    # 处理函数名（可能包含模块前缀）
-                    if func_name and '.' in func_name:
-                        # 如 host.tick，去掉模块前缀
-                        func_name = func_name.split('.')[-1]
-                    
-                    if module == '.builtin':
-                        callee_standard = f'<builtin>.{func_name}' if func_name else '<builtin>'
-                    else:
-                        callee_standard = f'{module}.{func_name}' if func_name else module
-                else:
-                    callee_standard = callee_name
-            else:
-                callee_standard = callee_name
+            callee_standard = standard_name(callee_name)[1]
             
             # 过滤内置函数（如果需要）
             if not include_builtin and callee_standard.startswith('<builtin>.'):
                 continue
             
-            # 添加调用边
-            call_edges.append((caller_name, callee_standard))
+            edges_append((caller_name, callee_standard))
+        
+        edges.sort()
+        
+        # 调用边按列存储（SoA）：edge_callers[i] -> edge_callees[i]
+        edge_callers = []
+        edge_callees = []
+        callers_map = {}
+        
+        edge_callers_append = edge_callers.append
+        edge_callees_append = edge_callees.append
+        callers_map_setdefault = callers_map.setdefault
+        
+        for caller_name, callee_standard in edges:
+            edge_callers_append(caller_name)
+            edge_callees_append(callee_standard)
             
             # 构建 callers 映射
-            if callee_standard not in callers_map:
-                callers_map[callee_standard] = []
-            if caller_name not in callers_map[callee_standard]:
-                callers_map[callee_standard].append(caller_name)
-        
-        # 统计信息
-        statistics = {
-            'total_undefined': len(set(external_functions_list)),
-            'modules_count': len(by_module),
-            'modules': list(by_module.keys()),
-            'by_module': {mod: len(funcs) for mod, funcs in by_module.items()},
-            'total_call_edges': len(call_edges),
-            'total_external_calls': len(external_calls_raw),
-            'total_internal_calls': len(internal_calls)
-        }
+            bucket = callers_map_setdefault(callee_standard, [])
+            if caller_name not in bucket:
+                bucket.append(caller_name)
+        
+        # 统计信息（按需计算）
+        statistics = _LazyStats({
+            'total_undefined': lambda: len(undefined_functions),
+            'modules_count': lambda: len(by_module),
+            'modules': lambda: list(by_module.keys()),
+            'by_module': lambda: {mod: len(funcs) for mod, funcs in by_module.items()},
+            'total_call_edges': lambda: len(edge_callers),
+            'total_external_calls': lambda: len(external_calls_raw),
+            'total_internal_calls': lambda: len(internal_calls)
+        })
         
         return {
-            'undefined_functions': sorted(list(set(external_functions_list))),
+            'undefined_functions': undefined_functions,
             'callers': callers_map,
             'by_module': by_module,
             'statistics': statistics,
-            'call_edges': call_edges,
+            'call_edges': {
+                'callers': edge_callers,
+                'callees': edge_callees
+            },
             'fasten_details': {
                 'external_modules': external_modules_raw,
                 'internal_modules': internal_modules,
@@ -332,12 +382,17 @@ def generate_call_graph_for_package(package_path: str, entry_points: Optional[Li
         Dict: 调用图
     """
     if entry_points is None:
-        # 自动查找所有 Python 文件
+        # 自动查找所有 Python 文件（os.scandir 的 DirEntry.path 已拼接好完整路径）
         entry_points = []
-        for root, dirs, files in os.walk(package_path):
-            for file in files:
-                if file.endswith('.py'):
-                    entry_points.append(os.path.join(root, file))
+        pending_dirs = [package_path]
+        while pending_dirs:
+            with os.scandir(pending_dirs.pop()) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            pending_dirs.append(entry.path)
+                    elif entry.name.endswith('.py'):
+                        entry_points.append(entry.path)
     
     wrapper = PyCGWrapper(entry_points, package_path)
     wrapper.analyze()
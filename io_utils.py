@@ -0,0 +1,77 @@
+"""
+文件写出工具函数
+
+main.py、C 提取器和 llm 模块共用
+"""
+
+import os
+import json
+import tempfile
+
+# orjson 可选：安装时用于生成JSON输出，否则使用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    先写入同目录下的临时文件再原子替换目标文件
+
+    中断时不会留下写了一半的文件；临时文件名由 mkstemp 生成，
+    并发写同一文件的多个进程不会互相覆盖对方的临时文件
+
+    Args:
+        path: 目标文件路径，所在目录不存在时创建
+        data: 要写入的字节串
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def dumps_json(data, default=None) -> bytes:
+    """
+    将数据序列化为缩进 2 格、非 ASCII 字符原样输出的 UTF-8 JSON 字节串
+    
+    安装了 orjson 时使用 orjson（OPT_INDENT_2 | OPT_NON_STR_KEYS），否则使用
+    json.dumps(indent=2, ensure_ascii=False)。提取结果中的字符串、整数、列表和字典两者输出相同，
+    其余情况有差异：
+    - 浮点数指数形式：orjson 为 1e16，json 为 1e+16
+    - NaN / Infinity：orjson 输出 null，json 输出 NaN / Infinity（不是合法 JSON）
+    - 超过 64 位的整数：orjson 不支持，此时改用 json 序列化
+    
+    Args:
+        data: 要序列化的数据
+        default: 可选，将不支持的对象转换为可序列化对象的函数
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            # 超过 64 位的整数等 orjson 不支持的值；其他无法序列化的对象 json 同样会抛出 TypeError
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False, default=default).encode('utf-8')
+
+
+def loads_json(text):
+    """
+    解析 JSON 文本；安装了 orjson 时使用 orjson.loads，否则使用 json.loads
+    
+    与 json.loads 的差异：超过 64 位的整数解析为浮点数；NaN / Infinity 不被接受。
+    解析失败时抛出的 orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方统一捕获后者即可
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
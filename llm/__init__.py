@@ -3,6 +3,10 @@ from .module_registration_prompts import (
     SYSTEM_PROMPT_MODULE_REGISTRATION,
     get_module_registration_analysis_prompt,
 )
+from .python_call_extraction_prompts import (
+    SYSTEM_PROMPT_PYTHON_CALL,
+    get_python_call_analysis_prompt,
+)
 from .module_registration_schema import (
     OUTPUT_SCHEMA,
     MODULE_SCHEMA,
@@ -14,6 +18,8 @@ __all__ = [
     'ClaudeClient',
     'SYSTEM_PROMPT_MODULE_REGISTRATION',
     'get_module_registration_analysis_prompt',
+    'SYSTEM_PROMPT_PYTHON_CALL',
+    'get_python_call_analysis_prompt',
     'OUTPUT_SCHEMA',
     'MODULE_SCHEMA',
     'PARAM_FORMAT_MAPPING',
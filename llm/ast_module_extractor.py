@@ -0,0 +1,289 @@
+"""
+基于tree-sitter的模块注册信息提取
+直接从PyModuleDef / PyMethodDef的初始化列表和PyArg_ParseTuple格式串中提取
+与LLM解析结果格式相同的模块信息；无法确定时返回None，交由LLM解析
+"""
+
+from typing import Dict, List, Optional, Tuple
+from tree_sitter import Language, Parser
+import tree_sitter_c
+
+try:
+    from .module_registration_schema import PARAM_FORMAT_MAPPING
+except ImportError:
+    from module_registration_schema import PARAM_FORMAT_MAPPING
+
+
+_PARSER = Parser(Language(tree_sitter_c.language()))
+
+# 格式单元 -> 参数类型，取映射说明中括号前的部分，如 "string (char*)" -> "string"
+_PARAM_TYPES = {fmt: desc.split(' (')[0] for fmt, desc in PARAM_FORMAT_MAPPING.items()}
+
+# 参数解析函数 -> 格式串参数的位置
+_ARG_PARSERS = {'PyArg_ParseTuple': 1, 'PyArg_ParseTupleAndKeywords': 2}
+
+# PyModuleDef 的字段顺序，按位置初始化时第 i 个值对应第 i 个字段
+_MODULE_DEF_FIELDS = ('m_base', 'm_name', 'm_doc', 'm_size', 'm_methods',
+                      'm_slots', 'm_traverse', 'm_clear', 'm_free')
+
+# 返回值构造函数 -> return_type，其他返回值均视为 "PyObject*"
+_RETURN_TYPES = {
+    'PyLong_FromLong': 'int',
+    'PyFloat_FromDouble': 'float',
+    'PyUnicode_FromString': 'string',
+}
+
+
+def _walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def _values(node) -> list:
+    return [child for child in node.named_children if child.type != 'comment']
+
+
+def _string_value(node) -> Optional[str]:
+    # 普通字符串字面量的内容；含转义序列或拼接字符串时返回None
+    if node is None or node.type != 'string_literal':
+        return None
+    parts = []
+    for child in node.named_children:
+        if child.type != 'string_content':
+            return None
+        parts.append(child.text.decode('utf-8'))
+    return ''.join(parts)
+
+
+def _identifier(node) -> Optional[str]:
+    # 函数指针前的类型转换，如 (PyCFunction)func，取被转换的标识符
+    while node is not None and node.type == 'cast_expression':
+        node = node.child_by_field_name('value')
+    if node is None or node.type != 'identifier':
+        return None
+    return node.text.decode('utf-8')
+
+
+def _declarator_name(node) -> Optional[str]:
+    for child in _walk(node):
+        if child.type == 'identifier':
+            return child.text.decode('utf-8')
+    return None
+
+
+def _function_name(function_node) -> Optional[str]:
+    for child in _walk(function_node.child_by_field_name('declarator')):
+        if child.type == 'function_declarator':
+            return _declarator_name(child.child_by_field_name('declarator'))
+    return None
+
+
+def _collect_definitions(root) -> Tuple[Dict, Dict, Dict]:
+    """收集PyModuleDef、PyMethodDef的初始化列表和函数定义（均以名称为键）"""
+    module_defs, method_defs, functions = {}, {}, {}
+    for node in _walk(root):
+        if node.type == 'function_definition':
+            name = _function_name(node)
+            if name:
+                functions[name] = node
+        elif node.type == 'declaration':
+            type_node = node.child_by_field_name('type')
+            type_name = type_node.text.decode('utf-8').split()[-1] if type_node else ''
+            if type_name not in ('PyModuleDef', 'PyMethodDef'):
+                continue
+            for declarator in node.children_by_field_name('declarator'):
+                value = declarator.child_by_field_name('value')
+                if declarator.type != 'init_declarator' or value is None or value.type != 'initializer_list':
+                    continue
+                target = module_defs if type_name == 'PyModuleDef' else method_defs
+                target[_declarator_name(declarator.child_by_field_name('declarator'))] = value
+    return module_defs, method_defs, functions
+
+
+def _module_fields(init_list) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    PyModuleDef初始化列表 -> (模块名, PyMethodDef数组名)
+
+    支持按位置、指定字段以及两者混用的写法（如 {PyModuleDef_HEAD_INIT, .m_name = "x", ...}）；
+    与C语义相同，指定字段之后的按位置的值接着该字段继续对应
+    """
+    fields = {}
+    position = 0
+    for value in _values(init_list):
+        if value.type == 'initializer_pair':
+            designator = value.child_by_field_name('designator')
+            if designator is None or designator.type != 'field_designator':
+                return None
+            field = designator.named_children[0].text.decode('utf-8')
+            if field not in _MODULE_DEF_FIELDS:
+                return None
+            fields[field] = value.child_by_field_name('value')
+            position = _MODULE_DEF_FIELDS.index(field) + 1
+        else:
+            if position >= len(_MODULE_DEF_FIELDS):
+                return None
+            fields[_MODULE_DEF_FIELDS[position]] = value
+            position += 1
+    name_node, methods_node = fields.get('m_name'), fields.get('m_methods')
+
+    module_name = _string_value(name_node)
+    if not module_name:
+        return None
+    if methods_node is None or methods_node.type == 'null':
+        return module_name, None
+    methods_name = _identifier(methods_node)
+    if methods_name is None:
+        return None
+    return module_name, methods_name
+
+
+def _method_entries(init_list) -> Optional[List[Tuple[str, str, set]]]:
+    """PyMethodDef初始化列表 -> [(python_name, c_function_name, 调用约定标志)]"""
+    entries = []
+    for entry in _values(init_list):
+        if entry.type != 'initializer_list':
+            return None
+        values = _values(entry)
+        if not values or values[0].type == 'null':
+            break  # 哨兵项 {NULL, NULL, 0, NULL}
+        if len(values) < 3:
+            return None
+        python_name = _string_value(values[0])
+        c_function_name = _identifier(values[1])
+        if not python_name or not c_function_name:
+            return None
+        flags = {node.text.decode('utf-8') for node in _walk(values[2]) if node.type == 'identifier'}
+        entries.append((python_name, c_function_name, flags))
+    return entries
+
+
+def _split_format(param_format: str) -> Optional[List[str]]:
+    """把格式串拆成格式单元，如 "s#|i" -> ["s#", "i"]；含映射表以外的单元时返回None"""
+    units = []
+    i = 0
+    while i < len(param_format):
+        char = param_format[i]
+        i += 1
+        if char in '|$':
+            continue
+        unit = char
+        if char == 'e' and i < len(param_format):
+            unit += param_format[i]
+            i += 1
+        if i < len(param_format) and param_format[i] in '#!&*' and unit + param_format[i] in _PARAM_TYPES:
+            unit += param_format[i]
+            i += 1
+        if unit not in _PARAM_TYPES:
+            return None
+        units.append(unit)
+    return units
+
+
+def _param_info(function_node, flags: set) -> Optional[Tuple[str, List[str]]]:
+    if 'METH_NOARGS' in flags:
+        return '', []
+    if 'METH_O' in flags:
+        return 'O', [_PARAM_TYPES['O']]
+
+    formats = set()
+    for node in _walk(function_node):
+        if node.type != 'call_expression':
+            continue
+        position = _ARG_PARSERS.get(_identifier(node.child_by_field_name('function')))
+        if position is None:
+            continue
+        args = _values(node.child_by_field_name('arguments'))
+        param_format = _string_value(args[position]) if len(args) > position else None
+        if param_format is None:
+            return None
+        # ":" 或 ";" 之后是函数名/错误信息，不属于参数格式
+        formats.add(param_format.split(':')[0].split(';')[0])
+
+    if not formats:
+        return '', []
+    if len(formats) > 1:
+        return None
+    param_format = formats.pop()
+    units = _split_format(param_format)
+    if units is None:
+        return None
+    return param_format, [_PARAM_TYPES[unit] for unit in units]
+
+
+def _return_type(function_node) -> str:
+    return_types = set()
+    for node in _walk(function_node):
+        if node.type == 'identifier' and node.text == b'Py_RETURN_NONE':
+            return_types.add('None')
+        elif node.type == 'return_statement':
+            values = _values(node)
+            if not values or values[0].type == 'null':
+                continue  # return NULL 为错误返回
+            value = values[0]
+            if value.type == 'identifier' and value.text == b'Py_None':
+                return_types.add('None')
+            elif value.type == 'call_expression':
+                function_name = _identifier(value.child_by_field_name('function'))
+                return_types.add(_RETURN_TYPES.get(function_name, 'PyObject*'))
+            else:
+                return_types.add('PyObject*')
+    return return_types.pop() if len(return_types) == 1 else 'PyObject*'
+
+
+def extract_module_registration(code: str) -> Optional[Dict]:
+    """
+    从模块注册代码块中直接提取模块信息
+
+    Args:
+        code: 包含PyModuleDef、PyMethodDef及注册的C函数的代码块
+
+    Returns:
+        Optional[Dict]: 与LLM解析结果格式相同的 {"modules": [...]}；
+            结构无法完整识别时（如宏展开、定义不在代码块中）返回None
+    """
+    root = _PARSER.parse(code.encode('utf-8')).root_node
+    module_defs, method_defs, functions = _collect_definitions(root)
+    if not module_defs:
+        return None
+
+    modules = []
+    for init_list in module_defs.values():
+        fields = _module_fields(init_list)
+        if fields is None:
+            return None
+        module_name, methods_name = fields
+
+        module_functions = []
+        if methods_name is not None:
+            if methods_name not in method_defs:
+                return None
+            entries = _method_entries(method_defs[methods_name])
+            if entries is None:
+                return None
+
+            for python_name, c_function_name, flags in entries:
+                function_node = functions.get(c_function_name)
+                if function_node is None:
+                    return None
+                param_info = _param_info(function_node, flags)
+                if param_info is None:
+                    return None
+                param_format, param_types = param_info
+                module_functions.append({
+                    "python_name": python_name,
+                    "c_function_name": c_function_name,
+                    "param_format": param_format,
+                    "param_types": param_types,
+                    "param_count": len(param_types),
+                    "return_type": _return_type(function_node)
+                })
+
+        modules.append({
+            "module_name": module_name,
+            "functions": module_functions
+        })
+
+    return {"modules": modules}
@@ -1,13 +1,62 @@
 import os
+import hashlib
+import threading
+from typing import Iterator, Optional
 import anthropic
 from dotenv import load_dotenv
+from io_utils import atomic_write
 
 
-class ClaudeClient:
-    def __init__(self, model: str = "claude-sonnet-4-20250514"):
+# 响应缓存目录：temperature=0 时相同模型、相同提示的响应直接复用
+LLM_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyctrace", "llm")
+
+# api_key -> anthropic.Anthropic，所有 ClaudeClient 共用同一个HTTP连接池
+_ANTHROPIC_CLIENTS = {}
+
+
+def _get_api_key():
+    api_key = os.getenv("ANTHROPIC_API_KEY") or os.getenv("CLAUDE_API_KEY")
+    if not api_key:
+        # 环境变量中没有时才读取 .env 文件
         load_dotenv()
-        
         api_key = os.getenv("ANTHROPIC_API_KEY") or os.getenv("CLAUDE_API_KEY")
+    return api_key
+
+
+def _get_anthropic_client(api_key: str) -> anthropic.Anthropic:
+    client = _ANTHROPIC_CLIENTS.get(api_key)
+    if client is None:
+        client = _ANTHROPIC_CLIENTS[api_key] = anthropic.Anthropic(api_key=api_key)
+    return client
+
+
+def _cache_file(model: str, system_prompt: Optional[str], prompt: str, max_tokens: int) -> str:
+    digest = hashlib.sha256()
+    for part in (model, system_prompt or "", prompt, str(max_tokens)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return os.path.join(LLM_CACHE_DIR, f"{digest.hexdigest()}.txt")
+
+
+def _read_cache(cache_file: str) -> Optional[str]:
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cache(cache_file: str, response: str):
+    # 原子写入，并发进程不会读到写了一半的缓存；缓存写入失败不影响本次结果
+    try:
+        atomic_write(cache_file, response.encode("utf-8"))
+    except OSError:
+        pass
+
+
+class ClaudeClient:
+    def __init__(self, model: str = "claude-sonnet-4-20250514", use_cache: bool = True):
+        api_key = _get_api_key()
         
         if not api_key:
             raise ValueError(
@@ -15,12 +64,28 @@ class ClaudeClient:
                 "in .env file or environment variables."
             )
         
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = _get_anthropic_client(api_key)
         self.model = model
+        self.use_cache = use_cache
+        # 最近一次请求的 token 用量和结束原因；同一客户端在多个线程间共用，按线程分别记录
+        self._last = threading.local()
     
-    def generate(self, prompt: str, max_tokens: int = 8192, temperature: float = 0) -> str:
+    @property
+    def last_usage(self):
+        return getattr(self._last, "usage", None)
+    
+    @property
+    def last_stop_reason(self) -> Optional[str]:
+        # "end_turn" 为完整响应；"max_tokens" 表示响应在长度上限处被截断
+        return getattr(self._last, "stop_reason", None)
+    
+    def stream(self, prompt: str, system_prompt: Optional[str] = None,
+               max_tokens: int = 8192, temperature: float = 0) -> Iterator[str]:
+        # 逐段产出响应文本，调用方可以边接收边处理，或提前中止
+        extra = {"system": system_prompt} if system_prompt is not None else {}
+        self._last.usage = self._last.stop_reason = None
         try:
-            message = self.client.messages.create(
+            with self.client.messages.stream(
                 model=self.model,
                 max_tokens=max_tokens,
                 temperature=temperature,
@@ -29,33 +94,40 @@ class ClaudeClient:
                         "role": "user",
                         "content": prompt
                     }
-                ]
-            )
-            
-            response_text = message.content[0].text.strip()
-            return response_text
+                ],
+                **extra
+            ) as stream:
+                yield from stream.text_stream
+                message = stream.get_final_message()
+                self._last.usage = message.usage
+                self._last.stop_reason = message.stop_reason
             
         except Exception as e:
             raise RuntimeError(f"API call failed: {e}")
     
+    def generate(self, prompt: str, max_tokens: int = 8192, temperature: float = 0) -> str:
+        return self._generate(prompt, None, max_tokens, temperature)
+    
     def generate_with_system(self, system_prompt: str, user_prompt: str, 
                             max_tokens: int = 8192, temperature: float = 0) -> str:
-        try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": user_prompt
-                    }
-                ]
-            )
-            
-            response_text = message.content[0].text.strip()
-            return response_text
-            
-        except Exception as e:
-            raise RuntimeError(f"API call failed: {e}")
\ No newline at end of file
+        return self._generate(user_prompt, system_prompt, max_tokens, temperature)
+    
+    def _generate(self, prompt: str, system_prompt: Optional[str],
+                  max_tokens: int, temperature: float) -> str:
+        # 只有 temperature=0 的结果可以复用
+        cache_file = None
+        if self.use_cache and temperature == 0:
+            cache_file = _cache_file(self.model, system_prompt, prompt, max_tokens)
+            cached = _read_cache(cache_file)
+            if cached is not None:
+                # 缓存中只有完整结束的响应
+                self._last.usage = None
+                self._last.stop_reason = "end_turn"
+                return cached
+        
+        response = "".join(self.stream(prompt, system_prompt=system_prompt,
+                                       max_tokens=max_tokens, temperature=temperature)).strip()
+        # 被截断（max_tokens）等未正常结束的响应不写入缓存，下次运行重新请求
+        if cache_file and self.last_stop_reason == "end_turn":
+            _write_cache(cache_file, response)
+        return response
@@ -9,10 +9,11 @@ SYSTEM_PROMPT_MODULE_REGISTRATION = """You are a professional C/Python code anal
 Please output strictly in the specified JSON format without any additional explanations or comments."""
 
 
-def get_module_registration_analysis_prompt(code: str) -> str:
-    param_format_desc = "\n".join([f"  '{k}': {v}" for k, v in PARAM_FORMAT_MAPPING.items()])
-    
-    prompt = f"""Please analyze the Python module registration information in the following C code and extract:
+_PARAM_FORMAT_DESC = "\n".join([f"  '{k}': {v}" for k, v in PARAM_FORMAT_MAPPING.items()])
+_SCHEMA_STR = get_schema_string()
+
+# 提示词中与待分析代码无关的部分（说明、参数映射表、输出格式），导入时生成一次
+MODULE_REGISTRATION_INSTRUCTIONS = f"""Please analyze the Python module registration information in the following C code and extract:
 
 1. **Module Name**: Extract from PyModuleDef structure
 2. **Registered Python Functions List**, each function includes:
@@ -25,14 +26,14 @@ def get_module_registration_analysis_prompt(code: str) -> str:
 
 ## Parameter Format Mapping Reference
 
-{param_format_desc}
+{_PARAM_FORMAT_DESC}
 
 ## Output Format Requirements
 
 **MUST strictly follow the JSON format below, DO NOT include any other text:**
 
 ```json
-{get_schema_string()}
+{_SCHEMA_STR}
 ```
 
 ## Notes
@@ -47,42 +48,40 @@ def get_module_registration_analysis_prompt(code: str) -> str:
    - "PyObject*" (returns other Python objects)
 4. Only return JSON, do not add any explanatory text
 
-## C Code
+"""
+
+
+def _module_code_section(code: str) -> str:
+    return f"""## C Code
 
 ```c
 {code}
 ```
 
 Please output the analysis result in JSON format:"""
-    
-    return prompt
+
+
+def get_module_registration_analysis_prompt(code: str) -> str:
+    return MODULE_REGISTRATION_INSTRUCTIONS + _module_code_section(code)
 
 
 def get_batch_module_registration_analysis_prompt(modules_code_list: list) -> str:
+    # 与单块提示使用同一份说明，批量发送的模块块按相同的要求解析
     code_sections = []
     for idx, code in enumerate(modules_code_list, 1):
         code_sections.append(f"### Module #{idx}\n\n```c\n{code}\n```")
     
     all_code = "\n\n".join(code_sections)
     
-    param_format_desc = "\n".join([f"  '{k}': {v}" for k, v in PARAM_FORMAT_MAPPING.items()])
-    
-    prompt = f"""Please analyze the Python module registration information in the following multiple C code snippets.
-
-## Parameter Format Mapping Reference
+    return MODULE_REGISTRATION_INSTRUCTIONS + f"""## Multiple Code Snippets
 
-{param_format_desc}
+The C code below consists of {len(modules_code_list)} independent snippets (Module #1 to Module #{len(modules_code_list)}). Analyze each snippet as described above and put all resulting module objects into the same modules array:
 
-## Output Format
-
-```json
-{get_schema_string()}
-```
+1. Add a "block_index" integer field to every module object, set to the number of the snippet it comes from (e.g., 1 for Module #1)
+2. Every snippet must produce at least one module object
 
 ## C Code Snippets
 
 {all_code}
 
-Please output the JSON format result containing all module information:"""
-    
-    return prompt
\ No newline at end of file
+Please output the JSON format result containing all module information:"""
\ No newline at end of file
@@ -63,6 +63,13 @@ PARAM_FORMAT_MAPPING = {
 }
 
 
+_SCHEMA_STRING = None
+
+
 def get_schema_string() -> str:
-    import json
-    return json.dumps(OUTPUT_SCHEMA, indent=2, ensure_ascii=False)
\ No newline at end of file
+    # OUTPUT_SCHEMA 不会改变，序列化结果只计算一次
+    global _SCHEMA_STRING
+    if _SCHEMA_STRING is None:
+        import json
+        _SCHEMA_STRING = json.dumps(OUTPUT_SCHEMA, indent=2, ensure_ascii=False)
+    return _SCHEMA_STRING
\ No newline at end of file
@@ -1,66 +1,80 @@
 import os
+import re
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
     from .llm_client import ClaudeClient
+    from .response_utils import save_prompt_and_response, save_json, parse_json_response, llm_debug_enabled
+    from .ast_module_extractor import extract_module_registration
     from .module_registration_prompts import (
         SYSTEM_PROMPT_MODULE_REGISTRATION, 
-        get_module_registration_analysis_prompt
+        get_module_registration_analysis_prompt,
+        get_batch_module_registration_analysis_prompt
     )
 except ImportError:
+    # 作为脚本运行时项目根目录不在 sys.path 中，共用的 io_utils 位于根目录
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
     from llm_client import ClaudeClient
+    from response_utils import save_prompt_and_response, save_json, parse_json_response, llm_debug_enabled
+    from ast_module_extractor import extract_module_registration
     from module_registration_prompts import (
         SYSTEM_PROMPT_MODULE_REGISTRATION, 
-        get_module_registration_analysis_prompt
+        get_module_registration_analysis_prompt,
+        get_batch_module_registration_analysis_prompt
     )
 
 
-def save_prompt_and_response(prompt: str, response: str, output_dir: Path):
-    prompt_file = output_dir / "module_registration_prompt.txt"
-    response_file = output_dir / "module_registration_response.txt"
-    
-    with open(prompt_file, 'w', encoding='utf-8') as f:
-        f.write(prompt)
-    
-    with open(response_file, 'w', encoding='utf-8') as f:
-        f.write(response)
-    
-    print(f"  Saved prompt to: {prompt_file}")
-    print(f"  Saved response to: {response_file}")
+# 模块块的标题行（新旧两种格式），一次正则扫描代替逐个子串查找
+MODULE_HEADER_RE = re.compile(r'C中的python注册模块 #|模块链 #')
 
+# 每次请求合并分析的模块块数量，固定的说明和输出格式只需发送一次
+MODULE_BATCH_SIZE = 8
 
-def clean_json_response(response_text: str) -> str:
-    response_text = response_text.strip()
-    
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    elif response_text.startswith("```"):
-        response_text = response_text[3:]
-    
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    
-    return response_text.strip()
+# 响应长度上限：按模块块中 PyMethodDef 项的数量估算（缩进后的JSON中每个函数约 60-70 token），
+# 至少 MODULE_MAX_TOKENS，不超过 MODULE_BATCH_MAX_TOKENS；批量请求取各块估算之和。
+# 响应仍在上限处被截断时，以 MODULE_BATCH_MAX_TOKENS 重新请求
+MODULE_MAX_TOKENS = 2048
+MODULE_TOKENS_PER_FUNCTION = 100
+MODULE_BATCH_MAX_TOKENS = 8192
 
+# PyMethodDef 数组中的一项 {"python_name", ...}
+METHOD_ENTRY_RE = re.compile(r'\{\s*"[^"]*"\s*,')
 
-def parse_module_with_llm(code: str, client: ClaudeClient, output_dir: Path = None) -> dict:
+# 同时进行的LLM请求数，各批请求相互独立
+LLM_MAX_WORKERS = 8
+
+
+def module_max_tokens(code: str) -> int:
+    # 函数较多的模块块需要更长的响应，否则输出在JSON中途被截断
+    estimate = MODULE_MAX_TOKENS // 2 + MODULE_TOKENS_PER_FUNCTION * len(METHOD_ENTRY_RE.findall(code))
+    return min(MODULE_BATCH_MAX_TOKENS, max(MODULE_MAX_TOKENS, estimate))
+
+
+def parse_module_with_llm(code: str, client: ClaudeClient, output_dir: Path = None,
+                          max_tokens: int = None) -> dict:
     prompt = get_module_registration_analysis_prompt(code)
+    if max_tokens is None:
+        max_tokens = module_max_tokens(code)
     
     try:
         response = client.generate_with_system(
             system_prompt=SYSTEM_PROMPT_MODULE_REGISTRATION,
             user_prompt=prompt,
-            max_tokens=8192,
+            max_tokens=max_tokens,
             temperature=0
         )
         
         if output_dir:
-            save_prompt_and_response(prompt, response, output_dir)
+            save_prompt_and_response(prompt, response, output_dir, "module_registration")
+        
+        if client.last_stop_reason == "max_tokens" and max_tokens < MODULE_BATCH_MAX_TOKENS:
+            print(f"  Response truncated at {max_tokens} tokens, retrying with {MODULE_BATCH_MAX_TOKENS}...")
+            return parse_module_with_llm(code, client, output_dir, MODULE_BATCH_MAX_TOKENS)
         
-        cleaned_response = clean_json_response(response)
-        result = json.loads(cleaned_response)
+        result = parse_json_response(response)
         return result
         
     except json.JSONDecodeError as e:
@@ -76,6 +90,47 @@ def parse_module_with_llm(code: str, client: ClaudeClient, output_dir: Path = No
             "error": str(e)
         }
 
+def parse_modules_batch_with_llm(codes: list, client: ClaudeClient, output_dir: Path = None) -> list:
+    # 一次请求分析多个模块块，返回与 codes 一一对应的结果（格式同 parse_module_with_llm）；
+    # 批量结果中缺失的块再单独请求
+    if len(codes) == 1:
+        return [parse_module_with_llm(codes[0], client, output_dir)]
+    
+    prompt = get_batch_module_registration_analysis_prompt(codes)
+    modules_by_block = {}
+    
+    try:
+        response = client.generate_with_system(
+            system_prompt=SYSTEM_PROMPT_MODULE_REGISTRATION,
+            user_prompt=prompt,
+            max_tokens=min(MODULE_BATCH_MAX_TOKENS, sum(module_max_tokens(code) for code in codes)),
+            temperature=0
+        )
+        
+        if output_dir:
+            save_prompt_and_response(prompt, response, output_dir, "module_registration")
+        
+        result = parse_json_response(response)
+        for module_info in result.get('modules', []):
+            block_index = module_info.pop('block_index', None)
+            modules_by_block.setdefault(block_index, []).append(module_info)
+        
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error: {e}")
+    except Exception as e:
+        print(f"LLM call error: {e}")
+    
+    results = []
+    for idx, code in enumerate(codes, 1):
+        if idx in modules_by_block:
+            results.append({"modules": modules_by_block[idx]})
+        else:
+            print(f"  Module #{idx} missing from batch result, parsing it separately...")
+            results.append(parse_module_with_llm(code, client, output_dir))
+    
+    return results
+
+
 def generate_function_stub(func_info: dict) -> str:
     python_name = func_info['python_name']
     param_types = func_info.get('param_types', [])
@@ -111,6 +166,8 @@ def save_python_stubs(json_data: dict, output_dir: Path):
     py_output_dir = output_dir / "py"
     py_output_dir.mkdir(exist_ok=True)
     
+    # 生成信息收集后一次性输出
+    messages = []
     for module_info in modules:
         module_name = module_info['module_name']
         stub_code = generate_module_stub(module_info)
@@ -119,17 +176,15 @@ def save_python_stubs(json_data: dict, output_dir: Path):
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(stub_code)
         
-        print(f"✓ Python 接口文件已生成: {output_file}")
+        messages.append(f"✓ Python 接口文件已生成: {output_file}\n")
+    
+    sys.stdout.write(''.join(messages))
 
 
-def parse_registration_file(input_file: str, output_file: str, model: str = "claude-sonnet-4-20250514"):
+def parse_registration_file(input_file: str, output_file: str, model: str = "claude-sonnet-4-20250514",
+                            use_cache: bool = True):
     print(f"Reading file: {input_file}")
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    client = ClaudeClient(model=model)
-    
     output_dir = Path(output_file).parent
     output_dir.mkdir(parents=True, exist_ok=True)
     
@@ -137,24 +192,53 @@ def parse_registration_file(input_file: str, output_file: str, model: str = "cla
     current_module = []
     in_module = False
     
-    for line in content.split('\n'):
-        if 'C中的python注册模块 #' in line or '模块链 #' in line:
-            if current_module:
-                module_codes.append('\n'.join(current_module))
-                current_module = []
-            in_module = True
-        elif in_module and line.strip():
-            if not line.startswith('='):
-                current_module.append(line)
+    # 逐行读取，内存中只保留当前模块块
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if MODULE_HEADER_RE.search(line):
+                if current_module:
+                    module_codes.append('\n'.join(current_module))
+                    current_module = []
+                in_module = True
+            elif in_module and line.strip():
+                if not line.startswith('='):
+                    current_module.append(line)
     
     if current_module:
         module_codes.append('\n'.join(current_module))
     
-    all_modules = []
-    for idx, code in enumerate(module_codes, 1):
-        print(f"\nParsing module #{idx}...")
-        result = parse_module_with_llm(code, client, output_dir)
+    # 内容相同的模块块只解析一次，最后按原顺序展开
+    unique_codes = list(dict.fromkeys(module_codes))
+    
+    # 先直接解析C代码结构，只有无法完整识别的模块块才交给LLM
+    results = [extract_module_registration(code) for code in unique_codes]
+    llm_indices = [idx for idx, result in enumerate(results) if result is None]
+    print(f"\nExtracted {len(unique_codes) - len(llm_indices)} of {len(unique_codes)} unique modules from C syntax tree")
+    
+    if llm_indices:
+        client = ClaudeClient(model=model, use_cache=use_cache)
+        llm_codes = [unique_codes[idx] for idx in llm_indices]
+        batches = [llm_codes[start:start + MODULE_BATCH_SIZE]
+                   for start in range(0, len(llm_codes), MODULE_BATCH_SIZE)]
+        print(f"Parsing {len(llm_codes)} modules with LLM in {len(batches)} batches...")
+        
+        # 各批并发请求，map 按提交顺序返回结果
+        with ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS) as executor:
+            llm_results = [result for batch_results in executor.map(
+                lambda batch: parse_modules_batch_with_llm(batch, client, output_dir), batches)
+                for result in batch_results]
         
+        for idx, result in zip(llm_indices, llm_results):
+            results[idx] = result
+        if llm_debug_enabled():
+            print(f"  Prompts and responses saved to: {output_dir / 'module_registration_*.txt'}")
+    
+    result_by_code = dict(zip(unique_codes, results))
+    
+    all_modules = []
+    for code in module_codes:
+        result = result_by_code[code]
         if 'modules' in result and isinstance(result['modules'], list):
             all_modules.extend(result['modules'])
         elif 'error' not in result:
@@ -166,8 +250,7 @@ def parse_registration_file(input_file: str, output_file: str, model: str = "cla
     }
     
     print(f"\nSaving result to: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    save_json(output_data, output_file)
     
     print(f"✓ Successfully parsed {len(all_modules)} modules")
     print(f"✓ Result saved to: {output_file}")
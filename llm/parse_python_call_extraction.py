@@ -1,65 +1,56 @@
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
     from .llm_client import ClaudeClient
+    from .response_utils import save_prompt_and_response, save_json, parse_json_response, llm_debug_enabled
     from .python_call_extraction_prompts import (
         SYSTEM_PROMPT_PYTHON_CALL,
-        get_python_call_analysis_prompt
+        get_python_call_analysis_prompt,
+        get_batch_python_call_analysis_prompt
     )
 except ImportError:
+    # 作为脚本运行时项目根目录不在 sys.path 中，共用的 io_utils 位于根目录
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
     from llm_client import ClaudeClient
+    from response_utils import save_prompt_and_response, save_json, parse_json_response, llm_debug_enabled
     from python_call_extraction_prompts import (
         SYSTEM_PROMPT_PYTHON_CALL,
-        get_python_call_analysis_prompt
+        get_python_call_analysis_prompt,
+        get_batch_python_call_analysis_prompt
     )
 
 
-def save_prompt_and_response(prompt: str, response: str, output_dir: Path):
-    prompt_file = output_dir / "python_call_prompt.txt"
-    response_file = output_dir / "python_call_response.txt"
-    
-    with open(prompt_file, 'w', encoding='utf-8') as f:
-        f.write(prompt)
-    
-    with open(response_file, 'w', encoding='utf-8') as f:
-        f.write(response)
-    
-    print(f"  Saved prompt to: {prompt_file}")
-    print(f"  Saved response to: {response_file}")
+# 每次请求合并分析的调用块数量，固定的说明和输出格式只需发送一次
+CALL_BATCH_SIZE = 8
 
+# 响应长度上限：单个调用块的JSON输出通常远小于此；批量请求按块数放大，
+# 但不超过 CALL_BATCH_MAX_TOKENS
+CALL_MAX_TOKENS = 4096
+CALL_BATCH_MAX_TOKENS = 8192
 
-def clean_json_response(response_text: str) -> str:
-    response_text = response_text.strip()
-    
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    elif response_text.startswith("```"):
-        response_text = response_text[3:]
-    
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    
-    return response_text.strip()
+# 同时进行的LLM请求数，各批请求相互独立
+LLM_MAX_WORKERS = 8
 
 
-def parse_call_with_llm(code: str, client: ClaudeClient, output_dir: Path = None) -> dict:
+def parse_call_with_llm(code: str, client: ClaudeClient, output_dir: Path = None,
+                        max_tokens: int = CALL_MAX_TOKENS) -> dict:
     prompt = get_python_call_analysis_prompt(code)
     
     try:
         response = client.generate_with_system(
             system_prompt=SYSTEM_PROMPT_PYTHON_CALL,
             user_prompt=prompt,
-            max_tokens=8192,
+            max_tokens=max_tokens,
             temperature=0
         )
         
         if output_dir:
-            save_prompt_and_response(prompt, response, output_dir)
+            save_prompt_and_response(prompt, response, output_dir, "python_call")
         
-        cleaned_response = clean_json_response(response)
-        result = json.loads(cleaned_response)
+        result = parse_json_response(response)
         return result
         
     except json.JSONDecodeError as e:
@@ -75,13 +66,51 @@ def parse_call_with_llm(code: str, client: ClaudeClient, output_dir: Path = None
             "error": str(e)
         }
 
-def parse_python_call_file(input_file: str, output_file: str, model: str = "claude-sonnet-4-20250514"):
-    print(f"Reading file: {input_file}")
+def parse_calls_batch_with_llm(codes: list, client: ClaudeClient, output_dir: Path = None) -> list:
+    # 一次请求分析多个调用块，返回与 codes 一一对应的结果（格式同 parse_call_with_llm）；
+    # 批量结果中缺失的块再单独请求
+    if len(codes) == 1:
+        return [parse_call_with_llm(codes[0], client, output_dir)]
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    prompt = get_batch_python_call_analysis_prompt(codes)
+    code_by_index = {}
+    
+    try:
+        response = client.generate_with_system(
+            system_prompt=SYSTEM_PROMPT_PYTHON_CALL,
+            user_prompt=prompt,
+            max_tokens=min(CALL_BATCH_MAX_TOKENS, CALL_MAX_TOKENS * len(codes)),
+            temperature=0
+        )
+        
+        if output_dir:
+            save_prompt_and_response(prompt, response, output_dir, "python_call")
+        
+        result = parse_json_response(response)
+        for call_info in result.get('python_calls', []):
+            code_by_index[call_info.get('index')] = call_info.get('python_code', '')
+        
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error: {e}")
+    except Exception as e:
+        print(f"LLM call error: {e}")
+    
+    results = []
+    for idx, code in enumerate(codes, 1):
+        if idx in code_by_index:
+            results.append({"python_code": code_by_index[idx]})
+        else:
+            print(f"  Call block #{idx} missing from batch result, parsing it separately...")
+            results.append(parse_call_with_llm(code, client, output_dir))
+    
+    return results
+
+
+def parse_python_call_file(input_file: str, output_file: str, model: str = "claude-sonnet-4-20250514",
+                           use_cache: bool = True):
+    print(f"Reading file: {input_file}")
     
-    client = ClaudeClient(model=model)
+    client = ClaudeClient(model=model, use_cache=use_cache)
     
     output_dir = Path(output_file).parent
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -90,68 +119,92 @@ def parse_python_call_file(input_file: str, output_file: str, model: str = "clau
     current_call = []
     in_call = False
     
-    for line in content.split('\n'):
-        if 'C中的Python API调用 #' in line:
-            if current_call:
-                call_codes.append('\n'.join(current_call))
-                current_call = []
-            in_call = True
-        elif in_call and line.strip() and not line.startswith('='):
-            current_call.append(line)
+    # 逐行读取，内存中只保留当前调用块
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if 'C中的Python API调用 #' in line:
+                if current_call:
+                    call_codes.append('\n'.join(current_call))
+                    current_call = []
+                in_call = True
+            elif in_call and line.strip() and not line.startswith('='):
+                current_call.append(line)
     
     if current_call:
         call_codes.append('\n'.join(current_call))
     
-    all_python_code = []
     all_results = []
     
+    # 内容相同的调用块只请求一次，结果按原顺序展开
+    unique_codes = list(dict.fromkeys(call_codes))
+    batches = [unique_codes[start:start + CALL_BATCH_SIZE]
+               for start in range(0, len(unique_codes), CALL_BATCH_SIZE)]
+    print(f"\nParsing {len(unique_codes)} unique call blocks in {len(batches)} batches...")
+    
+    # 各批并发请求，map 按提交顺序返回结果
+    results = []
+    with ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS) as executor:
+        for batch_results in executor.map(
+                lambda batch: parse_calls_batch_with_llm(batch, client, output_dir), batches):
+            results.extend(batch_results)
+    result_by_code = dict(zip(unique_codes, results))
+    if unique_codes and llm_debug_enabled():
+        print(f"  Prompts and responses saved to: {output_dir / 'python_call_*.txt'}")
+    
+    # 错误信息收集后一次性输出
+    errors = []
     for idx, code in enumerate(call_codes, 1):
-        print(f"\nParsing call block #{idx}...")
-        result = parse_call_with_llm(code, client, output_dir)
-        
+        result = result_by_code[code]
         if "error" not in result:
             python_code = result.get("python_code", "")
             if python_code:
-                all_python_code.append(f"# Block {idx}\n{python_code}\n")
                 all_results.append({
                     "block_id": idx,
                     "python_code": python_code
                 })
         else:
-            print(f"  Error parsing call block #{idx}: {result.get('error')}")
+            errors.append(f"  Error parsing call block #{idx}: {result.get('error')}\n")
+    sys.stdout.write(''.join(errors))
     
     final_result = {
         "total_blocks": len(all_results),
         "blocks": all_results
     }
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_result, f, indent=2, ensure_ascii=False)
+    save_json(final_result, output_file)
     
     print(f"✓ JSON result saved to: {output_file}")
     
-    if all_python_code:
+    if all_results:
         py_output_dir = output_dir / "py"
         py_output_dir.mkdir(exist_ok=True)
         py_output_file = py_output_dir / "python_call_in_c.py"
         
+        # 逐块写入，不再额外拼接一份完整文本；各块之间以空行分隔
         with open(py_output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(all_python_code))
+            for position, block in enumerate(all_results):
+                if position:
+                    f.write('\n')
+                f.write(f"# Block {block['block_id']}\n{block['python_code']}\n")
         
         print(f"✓ Python code saved to: {py_output_file}")
     
     print(f"\n✓ Successfully parsed {len(call_codes)} call blocks")
-    print(f"✓ Extracted {len(all_python_code)} Python code blocks")
+    print(f"✓ Extracted {len(all_results)} Python code blocks")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python parse_python_call_extraction.py <input_file> [output_file]")
+    args = [arg for arg in sys.argv[1:] if arg != '--no-cache']
+    use_cache = len(args) == len(sys.argv) - 1
+    
+    if len(args) < 1:
+        print("Usage: python parse_python_call_extraction.py <input_file> [output_file] [--no-cache]")
         print("\nExample:")
         print("  python parse_python_call_extraction.py output/c_python_call_extraction.txt output/c_python_call_extraction_llm.json")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "c_python_call_extraction_llm.json"
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else "c_python_call_extraction_llm.json"
     
-    parse_python_call_file(input_file, output_file)
\ No newline at end of file
+    parse_python_call_file(input_file, output_file, use_cache=use_cache)
\ No newline at end of file
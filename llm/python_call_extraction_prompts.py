@@ -3,8 +3,8 @@ SYSTEM_PROMPT_PYTHON_CALL = """You are a professional C/Python code analysis exp
 Please output strictly in the specified JSON format without any additional explanations or comments."""
 
 
-def get_python_call_analysis_prompt(code: str) -> str:
-    prompt = f"""Please analyze the following C code and convert it into executable Python code.
+# 提示词中与待分析代码无关的部分（任务说明、输出格式和示例）；批量提示只替换其中的输出格式
+_PYTHON_CALL_TASK = """Please analyze the following C code and convert it into executable Python code.
 
 ## Task: Convert to Python Code
 
@@ -14,17 +14,21 @@ Convert the C code into equivalent Python code:
 3. Combine them into complete, executable Python code
 4. Resolve dynamic function names (e.g., from snprintf, string concatenation)
 
-## Output Format Requirements
+"""
+
+_PYTHON_CALL_OUTPUT_FORMAT = """## Output Format Requirements
 
 **MUST strictly follow the JSON format below, DO NOT include any other text:**
 
 ```json
-{{
+{
   "python_code": "complete Python code here"
-}}
+}
 ```
 
-## Example
+"""
+
+_PYTHON_CALL_EXAMPLE = """## Example
 
 For C code:
 ```c
@@ -37,17 +41,61 @@ PyObject *ret = PyObject_CallObject(fn, args);
 
 Output:
 ```json
-{{
+{
   "python_code": "def add(a, b):\\n    return a + b\\n\\nadd(10, 20)"
-}}
+}
+```
+
+"""
+
+PYTHON_CALL_INSTRUCTIONS = _PYTHON_CALL_TASK + _PYTHON_CALL_OUTPUT_FORMAT + _PYTHON_CALL_EXAMPLE
+
+_BATCH_PYTHON_CALL_OUTPUT_FORMAT = """## Output Format Requirements
+
+The C code below consists of multiple independent snippets (Call #1, Call #2, ...). Convert each snippet separately as described above.
+
+**MUST strictly follow the JSON format below, DO NOT include any other text:**
+
+```json
+{
+  "python_calls": [
+    {
+      "index": 1,
+      "python_code": "complete Python code for Call #1 here"
+    }
+  ]
+}
 ```
 
-## C Code
+1. The python_calls array contains exactly one object per snippet, "index" is the snippet number (e.g., 1 for Call #1)
+2. In the example below, the "python_code" value is what goes into the object of the corresponding snippet
+
+"""
+
+
+def _call_code_section(code: str) -> str:
+    return f"""## C Code
 
 ```c
 {code}
 ```
 
 Please output the analysis result in JSON format:"""
+
+
+def get_python_call_analysis_prompt(code: str) -> str:
+    return PYTHON_CALL_INSTRUCTIONS + _call_code_section(code)
+
+
+def get_batch_python_call_analysis_prompt(calls_code_list: list) -> str:
+    code_sections = []
+    for idx, code in enumerate(calls_code_list, 1):
+        code_sections.append(f"### Call #{idx}\n\n```c\n{code}\n```")
+    
+    all_code = "\n\n".join(code_sections)
     
-    return prompt
\ No newline at end of file
+    return _PYTHON_CALL_TASK + _BATCH_PYTHON_CALL_OUTPUT_FORMAT + _PYTHON_CALL_EXAMPLE + f"""## C Code Snippets
+
+{all_code}
+
+Please output the JSON format result containing all converted Python code:"""
@@ -0,0 +1,57 @@
+import os
+import re
+import json
+import itertools
+from pathlib import Path
+
+from io_utils import dumps_json, loads_json
+
+
+# 响应中的JSON代码块（```json ... ``` 或 ``` ... ```）
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.S)
+_JSON_DECODER = json.JSONDecoder()
+
+# 设置该环境变量时保存每次请求的提示和响应，用于调试
+LLM_DEBUG_ENV = "PYCTRACE_LLM_DEBUG"
+
+# 请求编号，保存的文件名互不相同，并发请求不会互相覆盖
+_REQUEST_COUNTER = itertools.count(1)
+
+
+def llm_debug_enabled() -> bool:
+    return bool(os.environ.get(LLM_DEBUG_ENV))
+
+
+def save_prompt_and_response(prompt: str, response: str, output_dir: Path, name: str):
+    # 仅调试时保存：提示和响应写入同一个文件 {name}_{编号}.txt，以 "---" 行分隔
+    if not llm_debug_enabled():
+        return
+    
+    record_file = output_dir / f"{name}_{next(_REQUEST_COUNTER):04d}.txt"
+    with open(record_file, 'w', encoding='utf-8', buffering=64 * 1024) as f:
+        f.write(f"{prompt}\n---\n{response}")
+
+
+def save_json(data: dict, output_file: str):
+    with open(output_file, 'wb') as f:
+        f.write(dumps_json(data))
+
+
+def clean_json_response(response_text: str) -> str:
+    # 取第一个代码块（```json ... ```）中的内容，代码块前后可以有说明文字
+    match = JSON_FENCE_RE.search(response_text)
+    if match:
+        return match.group(1)
+    return response_text.strip()
+
+
+def parse_json_response(response_text: str) -> dict:
+    try:
+        cleaned = clean_json_response(response_text)
+        return loads_json(cleaned)
+    except json.JSONDecodeError:
+        # 回退：从第一个 { 开始解码一个完整的JSON对象，忽略其前后的多余文字
+        start = response_text.find('{')
+        if start == -1:
+            raise
+        return _JSON_DECODER.raw_decode(response_text, start)[0]
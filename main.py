@@ -1,113 +1,504 @@
 import os
+import re
 import sys
-import json
+import stat
+import pickle
+import hashlib
+import functools
+import traceback
+import importlib.metadata
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from collections import Counter
+from typing import List, Tuple, Dict, Any, Optional
 
-from C.py_module_extractor import CCodeParser, format_registration_info_json, format_registration_info_text
-from C.py_call_extractor import PythonCallExtractor, format_call_info_json, format_call_info_text
-from Python.pycg_wrapper import PyCGWrapper
-from llm.parse_module_registration import parse_registration_file
-from llm.parse_python_call_extraction import parse_python_call_file
-from Utils.c2python import convert_json_to_stubs
+from io_utils import atomic_write, dumps_json
+from C.py_module_extractor import CCodeParser, format_registration_info_json, write_registration_info_text, SEPARATOR
+from C.py_call_extractor import PythonCallExtractor, format_call_info_json, write_call_info_text
 
 
-def collect_files(folder_path: str) -> Tuple[List[str], List[str]]:
+# 收集的文件扩展名（不含前导点，小写）
+PYTHON_EXTENSIONS = frozenset(('py',))
+C_EXTENSIONS = frozenset(('c', 'h'))
+
+# 解析结果缓存目录（位于输出目录下）；缓存格式本身变化时递增版本号使旧缓存失效
+PARSE_CACHE_DIR = '.cache'
+PARSE_CACHE_VERSION = 1
+
+# 生成解析结果和输出文件的源码（相对项目根目录）及依赖包；源码内容和包版本计入缓存键，
+# 修改提取、格式化逻辑或升级 tree-sitter 后旧缓存和旧输出自动失效
+TOOL_SOURCE_PATTERNS = ('main.py', 'io_utils.py', 'C/*.py', 'C/analysis/*.py',
+                        'Python/pycg_wrapper.py', 'Python/PyCG/pycg/**/*.py')
+TOOL_PACKAGES = ('tree-sitter', 'tree-sitter-c')
+
+# 本次运行的解析缓存命中/未命中次数
+PARSE_CACHE_STATS = {'hit': 0, 'miss': 0}
+
+# 输出文件清单 {输出文件路径: (解析缓存键, 文件大小, 修改时间)}，位于 PARSE_CACHE_DIR 下；
+# 输入未变化且输出文件未被改动时跳过格式化和写入。PREVIOUS_OUTPUT_MANIFEST 为上次运行保存的清单，
+# OUTPUT_MANIFEST 只记录本次运行写出或确认未变化的输出，保存时不再保留本次未生成的输出
+OUTPUT_MANIFEST_FILE = 'outputs.pkl'
+PREVIOUS_OUTPUT_MANIFEST: Dict[str, Tuple[str, int, int]] = {}
+OUTPUT_MANIFEST: Dict[str, Tuple[str, int, int]] = {}
+
+# 命令行选项：不带值的开关，以及 --选项=<值> 形式的选项（含等号的前缀）
+FLAG_OPTIONS = frozenset(('--no-cache', '--stats-only'))
+VALUE_OPTIONS = ('--model=', '--json=', '--max-size=')
+
+
+def _scan_directory(directory: str, max_c_size: Optional[int] = None
+                    ) -> Tuple[List[Tuple[str, Tuple[int, int]]], List[str], List[str], List[str]]:
+    """
+    扫描单个目录（不递归）
+    
+    Args:
+        directory: 目录路径
+        max_c_size: 可选的 C/C++ 文件大小上限（字节），超过的文件不收集
+    
+    Returns:
+        Tuple: (子目录 [(路径, (st_dev, st_ino))], Python 文件, C/C++ 文件, 超过大小上限的 C/C++ 文件)
+    """
+    subdirs = []
     python_files = []
     c_files = []
+    large_files = []
     
-    folder = Path(folder_path)
-    if not folder.exists():
-        raise FileNotFoundError(f"文件夹不存在: {folder_path}")
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return subdirs, python_files, c_files, large_files
+    
+    with it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    subdirs.append((entry.path, (st.st_dev, st.st_ino)))
+                    continue
+            except OSError:
+                continue
+            
+            # 先按文件名过滤扩展名，只对可能收集的条目检查是否为文件
+            name = entry.name
+            dot = name.rfind('.')
+            if dot <= 0:
+                continue
+            ext = name[dot + 1:].lower()
+            if ext in PYTHON_EXTENSIONS:
+                target = python_files
+            elif ext in C_EXTENSIONS:
+                target = c_files
+            else:
+                continue
+            
+            try:
+                if not entry.is_file():
+                    continue
+                if max_c_size is not None and target is c_files and entry.stat().st_size > max_c_size:
+                    large_files.append(entry.path)
+                    continue
+            except OSError:
+                continue
+            target.append(entry.path)
     
-    if not folder.is_dir():
+    return subdirs, python_files, c_files, large_files
+
+
+def collect_files(folder_path: str, max_c_size: Optional[int] = None,
+                  root_stat: Optional[os.stat_result] = None) -> Tuple[List[str], List[str]]:
+    """
+    递归收集目录下的 Python 和 C/C++ 文件
+    
+    Args:
+        folder_path: 目录路径
+        max_c_size: 可选的 C/C++ 文件大小上限（字节）；超过的文件（如合并生成的大型源文件）
+                    不收集，并打印被跳过的文件
+        root_stat: 可选的 folder_path 的 os.stat 结果，调用方已检查过目录时传入以免重复 stat
+    
+    Returns:
+        Tuple: (Python 文件, C/C++ 文件)，均已排序
+    """
+    python_files = []
+    c_files = []
+    large_files = []
+    
+    # 一次 stat 同时完成存在性检查、目录检查和根目录的 (st_dev, st_ino)
+    if root_stat is None:
+        try:
+            root_stat = os.stat(folder_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"文件夹不存在: {folder_path}") from None
+    
+    if not stat.S_ISDIR(root_stat.st_mode):
         raise NotADirectoryError(f"不是一个有效的文件夹: {folder_path}")
     
-    for file_path in folder.rglob('*'):
-        if file_path.is_file():
-            suffix = file_path.suffix.lower()
-            if suffix == '.py':
-                python_files.append(str(file_path))
-            elif suffix in ['.c', '.h']:
-                c_files.append(str(file_path))
+    # 每个目录一个扫描任务，子目录扫描完成后再分发；os.scandir 会释放 GIL，
+    # 在深目录树或网络文件系统上可以并发等待 I/O
+    # 按 (st_dev, st_ino) 记录已扫描的目录，同一物理目录（如 bind mount）只扫描一次
+    visited = {(root_stat.st_dev, root_stat.st_ino)}
+    
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_directory, str(Path(folder_path)), max_c_size)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, dir_python_files, dir_c_files, dir_large_files = future.result()
+                python_files.extend(dir_python_files)
+                c_files.extend(dir_c_files)
+                large_files.extend(dir_large_files)
+                for subdir, dir_key in subdirs:
+                    if dir_key in visited:
+                        continue
+                    visited.add(dir_key)
+                    pending.add(executor.submit(_scan_directory, subdir, max_c_size))
+    
+    # 扫描完成顺序不确定，排序以保证输出稳定
+    python_files.sort()
+    c_files.sort()
+    
+    if large_files:
+        large_files.sort()
+        print_file_list(f"跳过 {len(large_files)} 个超过 {max_c_size} 字节的 C/C++ 文件:", large_files)
     
     return python_files, c_files
 
 
-def process_python_files(python_files: List[str], output_dir: str) -> Dict[str, Any]:
+def print_file_list(title: str, files: List[str]):
+    # 文件列表拼接后一次写出，文件较多且输出重定向时避免逐行 print 的开销
+    sys.stdout.write(f"\n{title}\n" + "".join(f"  - {f}\n" for f in files))
+
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def read_sources(files: List[str]) -> Dict[str, bytes]:
+    # 一次性读入源码字节串，供各解析阶段共用，避免同一文件被重复读取；
+    # 文件读取会释放 GIL，多个文件并发读取以重叠 I/O 等待（网络文件系统、冷缓存时明显）
+    if len(files) < 2:
+        return {file_path: _read_file(file_path) for file_path in files}
+    max_workers = min(32, (os.cpu_count() or 1) * 4, len(files))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(files, executor.map(_read_file, files)))
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_version() -> str:
+    """
+    缓存版本：PARSE_CACHE_VERSION、TOOL_SOURCE_PATTERNS 匹配的源码内容和 TOOL_PACKAGES 版本的哈希
+    
+    每次运行只计算一次；解析缓存键、单文件缓存和输出文件清单都以它区分版本
+    """
+    root = Path(__file__).resolve().parent
+    digest = hashlib.blake2b(str(PARSE_CACHE_VERSION).encode('ascii'), digest_size=16)
+    for pattern in TOOL_SOURCE_PATTERNS:
+        for path in sorted(root.glob(pattern)):
+            content = path.read_bytes()
+            digest.update(path.relative_to(root).as_posix().encode('utf-8') + b'\0')
+            digest.update(len(content).to_bytes(8, 'little'))
+            digest.update(content)
+    for package in TOOL_PACKAGES:
+        try:
+            version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            version = ''
+        digest.update(f"{package}={version}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _parse_cache_file(files: List[str], tag: str, output_dir: str,
+                      sources: Optional[Dict[str, bytes]] = None) -> str:
+    # 缓存文件路径：由阶段名称、缓存版本（含提取与格式化代码的哈希）和各输入文件的路径与内容哈希得到；
+    # 未提供已读入的内容时（如 PyCG 自行读取的 Python 文件）以文件大小和修改时间代替内容，
+    # 判断缓存是否可用时不必读取全部文件
+    digest = hashlib.blake2b(f"{tag}\0{_cache_version()}".encode('utf-8'), digest_size=16)
+    for file_path in files:
+        digest.update(file_path.encode('utf-8', 'surrogateescape') + b'\0')
+        if sources is not None:
+            content = sources[file_path]
+            digest.update(len(content).to_bytes(8, 'little'))
+            digest.update(content)
+        else:
+            st = os.stat(file_path)
+            digest.update(f"{st.st_size}:{st.st_mtime_ns}\0".encode('ascii'))
+    return os.path.join(output_dir, PARSE_CACHE_DIR, f"{tag}_{digest.hexdigest()}.pkl")
+
+
+def _cached_parse(files: List[str], tag: str, parse, output_dir: str,
+                  sources: Optional[Dict[str, bytes]] = None, pickled: bool = False) -> Tuple[Any, str]:
+    """
+    以输入文件的路径和内容（未提供 sources 时为文件大小和修改时间）为键缓存解析结果（pickle），
+    文件均未变化时跳过解析
+    
+    Args:
+        files: 输入文件列表
+        tag: 解析阶段名称，用作缓存文件名前缀
+        parse: 无参函数，缓存未命中时调用并返回解析结果
+        output_dir: 输出目录，缓存位于其下的 PARSE_CACHE_DIR
+        sources: 可选的已读入内容 {文件路径: 字节串}，提供时不再读取文件
+        pickled: parse 返回的是已 pickle 序列化的字节串（如后台进程的结果），
+                 直接写入缓存后反序列化一次，不再重复序列化
+        
+    Returns:
+        Tuple: (解析结果, 缓存键)；缓存键只由输入决定，用于判断输出文件是否需要重写
+    """
+    cache_file = _parse_cache_file(files, tag, output_dir, sources)
+    cache_key = os.path.basename(cache_file)
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            result = pickle.load(f)
+        PARSE_CACHE_STATS['hit'] += 1
+        return result, cache_key
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    
+    PARSE_CACHE_STATS['miss'] += 1
+    result = parse()
+    _write_cache(cache_file, result, pickled)
+    _remove_stale_parse_caches(cache_file, tag)
+    if pickled:
+        result = pickle.loads(result)
+    
+    return result, cache_key
+
+
+def _remove_stale_parse_caches(cache_file: str, tag: str):
+    # 同一阶段只保留刚写入的缓存：输入变化后旧的缓存不会再被命中，不删除会在缓存目录中不断累积
+    current = os.path.basename(cache_file)
+    stale_name = re.compile(re.escape(tag) + r'_[0-9a-f]{32}\.pkl').fullmatch
+    try:
+        entries = os.scandir(os.path.dirname(cache_file))
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name != current and stale_name(entry.name):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def _load_output_manifest(output_dir: str):
+    PREVIOUS_OUTPUT_MANIFEST.clear()
+    OUTPUT_MANIFEST.clear()
+    try:
+        with open(os.path.join(output_dir, PARSE_CACHE_DIR, OUTPUT_MANIFEST_FILE), 'rb') as f:
+            version, manifest = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return
+    if version == _cache_version():
+        PREVIOUS_OUTPUT_MANIFEST.update(manifest)
+
+
+def _save_output_manifest(output_dir: str):
+    _write_cache(os.path.join(output_dir, PARSE_CACHE_DIR, OUTPUT_MANIFEST_FILE),
+                 (_cache_version(), OUTPUT_MANIFEST))
+
+
+def _write_output(output_file: str, cache_key: str, write, description: str):
+    """
+    写出输出文件；上次由相同输入（cache_key）生成且之后未被改动时跳过
+    
+    Args:
+        output_file: 输出文件路径
+        cache_key: _cached_parse 返回的缓存键
+        write: 接收文本文件对象并写入内容的函数
+        description: 输出内容的说明，用于提示信息
+    """
+    try:
+        st = os.stat(output_file)
+        unchanged = PREVIOUS_OUTPUT_MANIFEST.get(output_file) == (cache_key, st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        unchanged = False
+    
+    if unchanged:
+        OUTPUT_MANIFEST[output_file] = PREVIOUS_OUTPUT_MANIFEST[output_file]
+        print(f"✓ {description}未变化，跳过写入: {output_file}")
+        return
+    
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write(f)
+    st = os.stat(output_file)
+    OUTPUT_MANIFEST[output_file] = (cache_key, st.st_size, st.st_mtime_ns)
+    print(f"✓ {description}已保存到: {output_file}")
+
+
+def _write_cache(cache_file: str, data, pickled: bool = False):
+    # 原子写入，中断或并发运行时不会留下不完整的缓存；pickled 为 True 时 data 已是序列化后的字节串
+    atomic_write(cache_file, data if pickled else pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _file_cache_path(output_dir: str, tag: str) -> str:
+    return os.path.join(output_dir, PARSE_CACHE_DIR, f"{tag}_files.pkl")
+
+
+def _load_file_cache(output_dir: str, tag: str) -> Dict:
+    """读取单文件解析结果缓存 {文件路径: (内容哈希, 解析结果)}，不存在或版本不符时返回空字典"""
+    try:
+        with open(_file_cache_path(output_dir, tag), 'rb') as f:
+            version, file_cache = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return {}
+    return file_cache if version == _cache_version() else {}
+
+
+def _save_file_cache(output_dir: str, tag: str, file_cache: Dict, files: List[str]):
+    # 只保留本次输入中的文件，已删除文件的结果不再保存
+    kept = {file_path: file_cache[file_path] for file_path in files if file_path in file_cache}
+    _write_cache(_file_cache_path(output_dir, tag), (_cache_version(), kept))
+
+
+def build_python_call_graph(python_files: List[str]) -> Dict[str, Any]:
+    # PyCG 只在缓存未命中时才需要，延迟导入
+    from Python.pycg_wrapper import PyCGWrapper
+    
+    wrapper = PyCGWrapper(entry_points=python_files)
+    wrapper.analyze()
+    
+    return wrapper.get_fasten_call_graph(
+        product="analyzed_code",
+        forge="local",
+        version="1.0.0",
+        timestamp=0
+    )
+
+
+def build_pickled_python_call_graph(python_files: List[str]) -> bytes:
+    # 在后台进程中运行：调用图在子进程中序列化一次后以字节串返回，父进程直接写入缓存文件，
+    # 不必再将收到的调用图重新序列化
+    return pickle.dumps(build_python_call_graph(python_files), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _dump_json(data: Any, f):
+    # 写入以 UTF-8 打开的文本文件对象；字节串直接写入底层二进制缓冲，不再解码为 str 后由文本层重新编码
+    f.flush()
+    f.buffer.write(dumps_json(data))
+
+
+def parse_registrations_with_llm(output_dir: str, llm_options: Dict[str, Any]):
+    print("\n正在使用 LLM 解析模块注册信息...")
+    try:
+        # LLM 客户端（anthropic）等依赖导入较慢，只在实际调用时导入
+        from llm.parse_module_registration import parse_registration_file
+        from Utils.c2python import convert_json_to_stubs
+        
+        txt_file = os.path.join(output_dir, "c_python_module_registrations.txt")
+        json_file = os.path.join(output_dir, "c_python_module_registrations_llm.json")
+        
+        parse_registration_file(txt_file, json_file, **llm_options)
+        
+        print("\n正在转换为 Python 代码...")
+        py_output_dir = os.path.join(output_dir, "py")
+        convert_json_to_stubs(json_file, py_output_dir)
+        
+    except Exception as e:
+        print(f"✗ LLM 解析出错: {e}")
+        traceback.print_exc()
+
+
+def parse_python_calls_with_llm(output_dir: str, llm_options: Dict[str, Any]):
+    print("\n正在使用 LLM 解析 Python 调用信息...")
+    try:
+        from llm.parse_python_call_extraction import parse_python_call_file
+        
+        call_txt_file = os.path.join(output_dir, "c_python_call_extraction.txt")
+        call_json_file = os.path.join(output_dir, "c_python_call_extraction_llm.json")
+        
+        parse_python_call_file(call_txt_file, call_json_file, **llm_options)
+        
+    except Exception as e:
+        print(f"✗ LLM 解析 Python 调用出错: {e}")
+        traceback.print_exc()
+
+
+def write_json_report(report: Dict[str, Any], report_file: str):
+    """将本次分析的汇总信息写为单个JSON文件，供其他工具直接读取"""
+    with open(report_file, 'w', encoding='utf-8') as f:
+        _dump_json(report, f)
+    print(f"\n✓ 汇总报告已保存到: {report_file}")
+
+
+def process_python_files(python_files: List[str], output_dir: str,
+                         call_graph_future: Optional[Future] = None) -> Dict[str, Any]:
     if not python_files:
         print("未找到 Python 文件")
         return {}
     
-    print(f"\n找到 {len(python_files)} 个 Python 文件:")
-    for f in python_files:
-        print(f"  - {f}")
+    print_file_list(f"找到 {len(python_files)} 个 Python 文件:", python_files)
     
     print("\n正在生成 Python FASTEN call graph...")
     
     try:
-        wrapper = PyCGWrapper(entry_points=python_files)
-        wrapper.analyze()
-        
-        call_graph = wrapper.get_fasten_call_graph(
-            product="analyzed_code",
-            forge="local",
-            version="1.0.0",
-            timestamp=0
-        )
+        # call_graph_future: 已在后台进程中开始的 PyCG 分析，提供时等待其结果（pickle 字节串）
+        if call_graph_future is not None:
+            call_graph, cache_key = _cached_parse(python_files, 'python_callgraph', call_graph_future.result,
+                                                  output_dir, pickled=True)
+        else:
+            call_graph, cache_key = _cached_parse(python_files, 'python_callgraph',
+                                                  lambda: build_python_call_graph(python_files), output_dir)
         
         output_file = os.path.join(output_dir, "python_fasten_callgraph.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(call_graph, f, indent=2, ensure_ascii=False)
-        
-        print(f"✓ Python FASTEN call graph 已保存到: {output_file}")
+        _write_output(output_file, cache_key,
+                      lambda f: _dump_json(call_graph, f),
+                      "Python FASTEN call graph ")
         
         return call_graph
         
     except Exception as e:
         print(f"✗ 处理 Python 文件时出错: {e}")
-        import traceback
         traceback.print_exc()
         return {}
 
 
-def process_c_files(c_files: List[str], output_dir: str) -> Dict[str, Any]:
+def process_c_files(c_files: List[str], output_dir: str,
+                    sources: Optional[Dict[str, bytes]] = None,
+                    trees: Optional[Dict] = None) -> Dict[str, Any]:
     if not c_files:
         print("未找到 C/C++ 文件")
         return {}
     
-    print(f"\n找到 {len(c_files)} 个 C/C++ 文件:")
-    for f in c_files:
-        print(f"  - {f}")
+    print_file_list(f"找到 {len(c_files)} 个 C/C++ 文件:", c_files)
     
     print("\n正在提取 C 代码中的 Python 模块注册信息...")
     
     try:
-        parser = CCodeParser()
-        result = parser.parse_files(c_files)
+        if sources is None:
+            sources = read_sources(c_files)
         
-        json_output_file = os.path.join(output_dir, "c_python_module_registrations.json")
-        with open(json_output_file, 'w', encoding='utf-8') as f:
-            f.write(format_registration_info_json(result))
+        def parse_registrations():
+            # 整体缓存未命中时按文件增量解析：只重新解析内容有变化的文件
+            file_cache = _load_file_cache(output_dir, 'c_registrations')
+            result = CCodeParser().parse_sources(sources, trees, file_cache)
+            _save_file_cache(output_dir, 'c_registrations', file_cache, c_files)
+            return result
         
-        print(f"✓ C 模块注册信息（JSON格式，含元数据）已保存到: {json_output_file}")
+        result, cache_key = _cached_parse(c_files, 'c_registrations', parse_registrations, output_dir, sources)
         
-        txt_output_file = os.path.join(output_dir, "c_python_module_registrations.txt")
-        with open(txt_output_file, 'w', encoding='utf-8') as f:
-            f.write(format_registration_info_text(result))
+        json_output_file = os.path.join(output_dir, "c_python_module_registrations.json")
+        _write_output(json_output_file, cache_key,
+                      lambda f: f.write(format_registration_info_json(result)),
+                      "C 模块注册信息（JSON格式，含元数据）")
         
-        print(f"✓ C 模块注册信息（TXT格式，纯代码）已保存到: {txt_output_file}")
+        txt_output_file = os.path.join(output_dir, "c_python_module_registrations.txt")
+        _write_output(txt_output_file, cache_key,
+                      lambda f: write_registration_info_text(result, f),
+                      "C 模块注册信息（TXT格式，纯代码）")
         
         return result
         
     except Exception as e:
         print(f"✗ 处理 C 文件时出错: {e}")
-        import traceback
         traceback.print_exc()
         return {}
 
 
-def process_python_calls(c_files: List[str], output_dir: str) -> Dict[str, Any]:
+def process_python_calls(c_files: List[str], output_dir: str,
+                         sources: Optional[Dict[str, bytes]] = None,
+                         trees: Optional[Dict] = None) -> Dict[str, Any]:
     if not c_files:
         print("未找到 C/C++ 文件")
         return {}
@@ -115,105 +506,195 @@ def process_python_calls(c_files: List[str], output_dir: str) -> Dict[str, Any]:
     print(f"\n正在提取 C 代码中的 Python C API 调用信息...")
     
     try:
-        extractor = PythonCallExtractor()
-        result = extractor.parse_files(c_files)
+        if sources is None:
+            sources = read_sources(c_files)
+        result, cache_key = _cached_parse(c_files, 'c_python_calls',
+                                          lambda: PythonCallExtractor().parse_sources(sources, trees),
+                                          output_dir, sources)
         
         json_output_file = os.path.join(output_dir, "c_python_call_extraction.json")
-        with open(json_output_file, 'w', encoding='utf-8') as f:
-            f.write(format_call_info_json(result))
-        
-        print(f"✓ Python C API 调用信息（JSON格式）已保存到: {json_output_file}")
+        _write_output(json_output_file, cache_key,
+                      lambda f: f.write(format_call_info_json(result)),
+                      "Python C API 调用信息（JSON格式）")
         
         txt_output_file = os.path.join(output_dir, "c_python_call_extraction.txt")
-        with open(txt_output_file, 'w', encoding='utf-8') as f:
-            f.write(format_call_info_text(result))
-        
-        print(f"✓ Python C API 调用信息（TXT格式）已保存到: {txt_output_file}")
+        _write_output(txt_output_file, cache_key,
+                      lambda f: write_call_info_text(result, f),
+                      "Python C API 调用信息（TXT格式）")
         
         return result
         
     except Exception as e:
         print(f"✗ 提取 Python C API 调用信息时出错: {e}")
-        import traceback
         traceback.print_exc()
         return {}
 
 
+def _print_usage():
+    print("用法: python main.py <文件夹路径> [输出目录] [--no-cache] [--model=<模型名>] [--stats-only] [--json=<路径>] [--max-size=<字节数>]")
+    print("\n示例:")
+    print("  python main.py /path/to/code")
+    print("  python main.py /path/to/code /path/to/output")
+    print("  python main.py /path/to/code --no-cache")
+    print("  python main.py /path/to/code --model=claude-3-5-haiku-20241022")
+    print("  python main.py /path/to/code --stats-only")
+    print("  python main.py /path/to/code --json=report.json")
+    print("  python main.py /path/to/code --max-size=2000000")
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python main.py <文件夹路径> [输出目录]")
-        print("\n示例:")
-        print("  python main.py /path/to/code")
-        print("  python main.py /path/to/code /path/to/output")
+    # --no-cache: 不使用LLM响应缓存，所有请求重新调用API
+    # --model=<模型名>: LLM解析使用的模型，例如更快的 claude-haiku 系列
+    # --stats-only: 只收集文件并输出统计信息，跳过全部解析和LLM阶段
+    # --json=<路径>: 另外输出一个汇总JSON（文件列表、提取数量、输出文件）
+    # --max-size=<字节数>: 跳过超过该大小的 C/C++ 文件（如合并生成的大型源文件）
+    options = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    # 拼写错误的选项（如 --no-cahce）不能被静默忽略、以默认设置运行
+    for option in options:
+        if option in FLAG_OPTIONS or option.startswith(VALUE_OPTIONS):
+            continue
+        if option + '=' in VALUE_OPTIONS:
+            # 不带 = 的写法会把后面的值当作输出目录等位置参数
+            print(f"错误: {option} 需要写成 {option}=<值> 的形式")
+        else:
+            print(f"错误: 未知选项 - {option}")
+        _print_usage()
+        sys.exit(1)
+    
+    llm_options = {"use_cache": '--no-cache' not in options}
+    for option in options:
+        if option.startswith('--model='):
+            llm_options["model"] = option[len('--model='):]
+    
+    report_file = None
+    max_c_size = None
+    for option in options:
+        if option.startswith('--json='):
+            report_file = option[len('--json='):]
+        elif option.startswith('--max-size='):
+            try:
+                max_c_size = int(option[len('--max-size='):])
+            except ValueError:
+                print(f"错误: 无效的文件大小上限 - {option}")
+                sys.exit(1)
+    
+    if len(args) < 1:
+        _print_usage()
         sys.exit(1)
     
-    folder_path = sys.argv[1]
+    folder_path = args[0]
+    
+    # 一次 stat 同时判断路径是否存在、是否为目录
+    try:
+        folder_stat = os.stat(folder_path)
+    except FileNotFoundError:
+        print(f"错误: 目录不存在 - {folder_path}")
+        sys.exit(1)
+    if not stat.S_ISDIR(folder_stat.st_mode):
+        print(f"错误: 路径不是目录 - {folder_path}")
+        sys.exit(1)
     
-    if len(sys.argv) > 2:
-        output_dir = sys.argv[2]
+    if len(args) > 1:
+        output_dir = args[1]
     else:
         folder_name = os.path.basename(os.path.abspath(folder_path))
         output_dir = f"{folder_name}_output"
     
-    os.makedirs(output_dir, exist_ok=True)
+    stats_only = '--stats-only' in options
+    if not stats_only:
+        os.makedirs(output_dir, exist_ok=True)
+        _load_output_manifest(output_dir)
     
-    print("=" * 80)
+    print(SEPARATOR)
     print("PyCTrace - Python-C 跨语言函数调用分析工具")
-    print("=" * 80)
+    print(SEPARATOR)
     print(f"\n分析目标: {folder_path}")
-    print(f"输出目录: {output_dir}")
+    if not stats_only:
+        print(f"输出目录: {output_dir}")
     
     print("\n正在收集文件...")
-    python_files, c_files = collect_files(folder_path)
+    python_files, c_files = collect_files(folder_path, max_c_size, folder_stat)
     
     print(f"\n统计信息:")
     print(f"  Python 文件: {len(python_files)} 个")
     print(f"  C/C++ 文件: {len(c_files)} 个")
     
+    report = {"folder": folder_path, "python_files": python_files, "c_files": c_files}
+    
     if not python_files and not c_files:
         print("\n未找到任何 Python 或 C/C++ 文件")
+        # 与 --stats-only 一样写出（空的）汇总报告，调用方不必区分报告文件缺失的情况
+        if report_file:
+            write_json_report(report, report_file)
+        return
+    
+    if stats_only:
+        # 只需要文件统计时，解析、调用图和LLM阶段都不会被用到，直接结束
+        print("\n已跳过: PyCG 调用图、C 模块注册/调用提取、LLM 解析 (--stats-only)")
+        if report_file:
+            write_json_report(report, report_file)
+        print("\n" + SEPARATOR)
+        print("分析完成!")
+        print(SEPARATOR)
         return
     
-    if python_files:
+    if python_files and not c_files:
         process_python_files(python_files, output_dir)
     
     if c_files:
-        c_result = process_c_files(c_files, output_dir)
-        
-        process_python_calls(c_files, output_dir)
+        # PyCG 分析（纯 Python、CPU 密集）与 C 文件的处理互不依赖：调用图缓存未命中时
+        # 在单独的进程中先开始分析，C 文件处理完成后再取结果
+        background = None
+        call_graph_future = None
+        if python_files and not os.path.exists(_parse_cache_file(python_files, 'python_callgraph', output_dir)):
+            # multiprocessing 导入较慢，只在需要后台分析时导入
+            from concurrent.futures import ProcessPoolExecutor
+            background = ProcessPoolExecutor(max_workers=1)
+            call_graph_future = background.submit(build_pickled_python_call_graph, python_files)
         
-        if c_result and c_result.get('module_chains'):
-            print("\n正在使用 LLM 解析模块注册信息...")
-            try:
-                txt_file = os.path.join(output_dir, "c_python_module_registrations.txt")
-                json_file = os.path.join(output_dir, "c_python_module_registrations_llm.json")
-                
-                parse_registration_file(txt_file, json_file)
-                
-                print("\n正在转换为 Python 代码...")
-                py_output_dir = os.path.join(output_dir, "py")
-                convert_json_to_stubs(json_file, py_output_dir)
-                
-            except Exception as e:
-                print(f"✗ LLM 解析出错: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        print("\n正在使用 LLM 解析 Python 调用信息...")
         try:
-            call_txt_file = os.path.join(output_dir, "c_python_call_extraction.txt")
-            call_json_file = os.path.join(output_dir, "c_python_call_extraction_llm.json")
+            # C 文件只读取一次；两个提取阶段共用源码和 tree-sitter 语法树，每个文件只解析一次
+            c_sources = read_sources(c_files)
+            c_trees = {}
+            c_result = process_c_files(c_files, output_dir, c_sources, c_trees)
+            
+            call_result = process_python_calls(c_files, output_dir, c_sources, c_trees)
             
-            parse_python_call_file(call_txt_file, call_json_file)
+            python_calls = call_result.get('python_calls') or []
+            report["module_chains"] = len(c_result.get('module_chains') or [])
+            report["python_calls"] = len(python_calls)
+            report["python_calls_per_file"] = dict(Counter(call.get('file', '') for call in python_calls))
             
-        except Exception as e:
-            print(f"✗ LLM 解析 Python 调用出错: {e}")
-            import traceback
-            traceback.print_exc()
+            # 两个 LLM 解析阶段都受网络延迟限制且互不依赖（输入、输出文件各不相同），并发执行；
+            # 各阶段自行捕获并打印异常，一个阶段出错不影响另一个
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                if c_result and c_result.get('module_chains'):
+                    executor.submit(parse_registrations_with_llm, output_dir, llm_options)
+                executor.submit(parse_python_calls_with_llm, output_dir, llm_options)
+            
+            if python_files:
+                process_python_files(python_files, output_dir, call_graph_future)
+        finally:
+            # 出错或中断（Ctrl-C）时也关闭后台进程池，尚未开始的分析直接取消
+            if background is not None:
+                background.shutdown(cancel_futures=True)
+    
+    _save_output_manifest(output_dir)
+    
+    if report_file:
+        report["output_dir"] = output_dir
+        # OUTPUT_MANIFEST 只含本次运行写出或确认未变化的输出，不含之前运行留下的文件
+        report["outputs"] = sorted(OUTPUT_MANIFEST)
+        write_json_report(report, report_file)
+    
+    if PARSE_CACHE_STATS['hit'] or PARSE_CACHE_STATS['miss']:
+        print(f"\n解析缓存: 命中 {PARSE_CACHE_STATS['hit']} 次, 未命中 {PARSE_CACHE_STATS['miss']} 次")
     
-    print("\n" + "=" * 80)
+    print("\n" + SEPARATOR)
     print("分析完成!")
-    print("=" * 80)
+    print(SEPARATOR)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+#include <Python.h>
+
+static PyObject* greet(PyObject* self, PyObject* args) {
+    const char* name;
+    if (!PyArg_ParseTuple(args, "s", &name)) {
+        return NULL;
+    }
+    return PyUnicode_FromString(name);
+}
+
+static PyObject* version(PyObject* self, PyObject* ignored) {
+    return PyLong_FromLong(7);
+}
+
+static PyObject* identity(PyObject* self, PyObject* arg) {
+    Py_INCREF(arg);
+    return arg;
+}
+
+static PyMethodDef module7_methods[] = {
+    {"greet", greet, METH_VARARGS, "Greet someone"},
+    {"version", (PyCFunction)version, METH_NOARGS, "Module version"},
+    {"identity", (PyCFunction)identity, METH_O, "Return the argument"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module7def = {
+    .m_base = PyModuleDef_HEAD_INIT,
+    .m_name = "module7",
+    .m_doc = "Module 7 documentation",
+    .m_size = -1,
+    .m_methods = module7_methods,
+};
+
+PyMODINIT_FUNC PyInit_module7(void) {
+    return PyModule_Create(&module7def);
+}
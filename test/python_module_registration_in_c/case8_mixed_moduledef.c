@@ -0,0 +1,33 @@
+#include <Python.h>
+
+static PyObject* scale(PyObject* self, PyObject* args, PyObject* kwargs) {
+    static char* kwlist[] = {"value", "factor", NULL};
+    double value;
+    double factor = 2.0;
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "d|d:scale", kwlist, &value, &factor)) {
+        return NULL;
+    }
+    return PyFloat_FromDouble(value * factor);
+}
+
+static PyObject* reset(PyObject* self, PyObject* ignored) {
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef module8_methods[] = {
+    {"scale", (PyCFunction)(void(*)(void))scale, METH_VARARGS | METH_KEYWORDS, "Scale a value"},
+    {"reset", (PyCFunction)reset, METH_NOARGS, "Reset state"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module8def = {
+    PyModuleDef_HEAD_INIT,
+    .m_name = "module8",
+    .m_doc = "Module 8 documentation",
+    .m_size = -1,
+    .m_methods = module8_methods,
+};
+
+PyMODINIT_FUNC PyInit_module8(void) {
+    return PyModule_Create(&module8def);
+}
@@ -0,0 +1,86 @@
+#include <Python.h>
+
+/* 以下模块的结构无法直接从语法树完整识别，应交给 LLM 解析 */
+
+#define MODULE9A_NAME "module9a"
+
+/* 模块名来自宏 */
+static PyObject* ping(PyObject* self, PyObject* args) {
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef module9a_methods[] = {
+    {"ping", ping, METH_NOARGS, "Ping"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module9adef = {
+    PyModuleDef_HEAD_INIT,
+    MODULE9A_NAME,
+    NULL,
+    -1,
+    module9a_methods
+};
+
+PyMODINIT_FUNC PyInit_module9a(void) {
+    return PyModule_Create(&module9adef);
+}
+
+/* 参数格式串不是字符串字面量 */
+static const char* parse_format = "i";
+
+static PyObject* parse_dynamic(PyObject* self, PyObject* args) {
+    int value;
+    if (!PyArg_ParseTuple(args, parse_format, &value)) {
+        return NULL;
+    }
+    return PyLong_FromLong(value);
+}
+
+static PyMethodDef module9b_methods[] = {
+    {"parse_dynamic", parse_dynamic, METH_VARARGS, "Parse with a runtime format"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module9bdef = {
+    PyModuleDef_HEAD_INIT,
+    "module9b",
+    NULL,
+    -1,
+    module9b_methods
+};
+
+PyMODINIT_FUNC PyInit_module9b(void) {
+    return PyModule_Create(&module9bdef);
+}
+
+/* 同一函数按不同格式串解析参数 */
+static PyObject* parse_either(PyObject* self, PyObject* args) {
+    long number;
+    const char* text;
+    if (PyArg_ParseTuple(args, "l", &number)) {
+        return PyLong_FromLong(number);
+    }
+    PyErr_Clear();
+    if (!PyArg_ParseTuple(args, "s", &text)) {
+        return NULL;
+    }
+    return PyUnicode_FromString(text);
+}
+
+static PyMethodDef module9c_methods[] = {
+    {"parse_either", parse_either, METH_VARARGS, "Parse a number or a string"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module9cdef = {
+    PyModuleDef_HEAD_INIT,
+    "module9c",
+    NULL,
+    -1,
+    module9c_methods
+};
+
+PyMODINIT_FUNC PyInit_module9c(void) {
+    return PyModule_Create(&module9cdef);
+}
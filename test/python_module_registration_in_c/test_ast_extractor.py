@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+基于语法树的模块注册提取（llm/ast_module_extractor.py）测试脚本
+
+对每个测试用例，按 main.py 的流程生成模块注册文本并拆分为模块块，
+逐块调用 extract_module_registration，与预期结果比对；
+预期为 None 的块表示无法直接识别、应交给 LLM 解析
+"""
+
+import sys
+import os
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(TEST_DIR, '../..'))
+# ast_module_extractor 按脚本方式导入，不加载 llm 包（LLM 客户端依赖）
+for path in (project_root, os.path.join(project_root, 'llm')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from C.py_module_extractor import CCodeParser, format_registration_info_text
+from ast_module_extractor import extract_module_registration
+
+
+def _function(python_name, param_format='', param_types=(), return_type='int', c_function_name=None):
+    return {
+        "python_name": python_name,
+        "c_function_name": c_function_name or python_name,
+        "param_format": param_format,
+        "param_types": list(param_types),
+        "param_count": len(param_types),
+        "return_type": return_type
+    }
+
+
+def _module(module_name, *functions):
+    return {"modules": [{"module_name": module_name, "functions": list(functions)}]}
+
+
+# 测试用例 -> 各模块块的预期提取结果（None 表示交给 LLM 解析）
+EXPECTED = {
+    # 按位置初始化的 PyModuleDef
+    'case1_1module_1func.c': [_module('module1', _function('func1'))],
+    'case2_1module_2func.c': [_module('module2', _function('func1'), _function('func2'))],
+    'case3_2module_1func_each.c': [_module('module3a', _function('func1')),
+                                   _module('module3b', _function('func2'))],
+    'case4_2module_mixed_funcs.c': [_module('module4a', _function('func1')),
+                                    _module('module4b', _function('func2'), _function('func3'))],
+    # 指定字段初始化的 PyModuleDef；(PyCFunction) 类型转换、METH_NOARGS / METH_O
+    'case7_designated_moduledef.c': [_module(
+        'module7',
+        _function('greet', 's', ['string'], 'string'),
+        _function('version'),
+        _function('identity', 'O', ['PyObject*'], 'PyObject*'),
+    )],
+    # 按位置与指定字段混用的 PyModuleDef（CPython 写法）；PyArg_ParseTupleAndKeywords
+    'case8_mixed_moduledef.c': [_module(
+        'module8',
+        _function('scale', 'd|d', ['double', 'double'], 'float'),
+        _function('reset', return_type='None'),
+    )],
+    # 模块名来自宏、格式串不是字面量、同一函数有多个格式串
+    'case9_llm_fallback.c': [None, None, None],
+}
+
+
+def extract_blocks(file_path):
+    """生成模块注册文本并按 parse_registration_file 的规则拆分为模块块"""
+    text = format_registration_info_text(CCodeParser().parse_files([file_path]))
+
+    blocks = []
+    current = []
+    in_module = False
+    for line in text.split('\n'):
+        if 'C中的python注册模块 #' in line:
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            in_module = True
+        elif in_module and line.strip() and not line.startswith('='):
+            current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+def check_case(file_name, expected):
+    blocks = extract_blocks(os.path.join(TEST_DIR, file_name))
+    results = [extract_module_registration(block) for block in blocks]
+
+    if results == expected:
+        print(f"✓ {file_name}: {len(blocks)} 个模块块")
+        return True
+
+    print(f"✗ {file_name}")
+    print(f"  预期: {expected}")
+    print(f"  实际: {results}")
+    return False
+
+
+def main():
+    print("=" * 80)
+    print("  基于语法树的模块注册提取 - 测试")
+    print("=" * 80 + "\n")
+
+    failed = [name for name, expected in EXPECTED.items() if not check_case(name, expected)]
+
+    if failed:
+        print(f"\n✗ {len(failed)} 个用例失败: {', '.join(failed)}\n")
+        return 1
+    print(f"\n✓ 全部 {len(EXPECTED)} 个用例通过\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,21 +5,25 @@ Python C API 调用提取测试脚本
 """
 
 import sys
-import os
 from pathlib import Path
 
 project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
-sys.path.insert(0, str(project_root / 'C'))
+# 已在 sys.path 中的路径不重复插入（脚本被多次导入时不会堆积重复条目）
+for path in (str(project_root), str(project_root / 'C')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
-from py_call_extractor import PythonCallExtractor, format_call_info_text, format_call_info_json
+SEP = "=" * 80
 
 
 def analyze_c_file(file_path, show_json=False):
     """分析单个或多个 C 文件"""
-    print("="*80)
+    # 提取器（tree-sitter 与分析模块）在真正分析时才导入，交互模式直接退出时不加载
+    from py_call_extractor import PythonCallExtractor, write_call_info_text, format_call_info_json
+    
+    print(SEP)
     print("  Python C API 调用提取")
-    print("="*80)
+    print(SEP)
     
     if isinstance(file_path, str):
         file_paths = [file_path]
@@ -27,44 +31,52 @@ def analyze_c_file(file_path, show_json=False):
         file_paths = file_path
     
     print(f"\n分析文件:")
+    # 直接读取文件内容，打开失败即视为不存在；不再先单独检查存在性、再由 parse_files 重新打开
+    sources = {}
     for fp in file_paths:
-        if not os.path.exists(fp):
+        try:
+            with open(fp, 'rb') as f:
+                sources[fp] = f.read()
+        except FileNotFoundError:
             print(f"  ❌ 文件不存在: {fp}")
             return
         print(f"  - {fp}")
     
     print("\n正在分析...")
     extractor = PythonCallExtractor()
-    result = extractor.parse_files(file_paths)
-    
-    print("\n" + "="*80)
-    print("  分析摘要")
-    print("="*80)
-    print(f"总调用数: {result['total_calls']}")
-    print(f"总函数数: {result['total_functions']}")
-    print(f"全局函数: {', '.join(result['global_functions']) if result['global_functions'] else '无'}")
+    result = extractor.parse_sources(sources)
     
-    print("\n" + "="*80)
-    print("  提取结果（文本格式）")
-    print("="*80)
-    print(format_call_info_text(result))
+    # 摘要块拼接成一段文本，一次写出
+    global_functions = ', '.join(result['global_functions']) if result['global_functions'] else '无'
+    sys.stdout.write(
+        f"\n{SEP}\n"
+        f"  分析摘要\n"
+        f"{SEP}\n"
+        f"总调用数: {result['total_calls']}\n"
+        f"总函数数: {result['total_functions']}\n"
+        f"全局函数: {global_functions}\n"
+        f"\n{SEP}\n"
+        f"  提取结果（文本格式）\n"
+        f"{SEP}\n"
+    )
+    # 逐行写出到标准输出，不在内存中拼接完整文本
+    write_call_info_text(result, sys.stdout)
+    sys.stdout.write('\n')
     
     if show_json:
-        print("\n" + "="*80)
+        print("\n" + SEP)
         print("  提取结果（JSON格式）")
-        print("="*80)
+        print(SEP)
         print(format_call_info_json(result))
     
-    print("="*80)
-    print("✓ 分析完成！")
-    print("="*80)
+    sys.stdout.write(f"{SEP}\n✓ 分析完成！\n{SEP}\n")
 
 
 def interactive_mode():
     """交互式输入模式"""
-    print("="*80)
+    print(SEP)
     print("  Python C API 调用提取 - 交互模式")
-    print("="*80)
+    print(SEP)
     print()
     print("提示:")
     print("  - 输入单个 C 文件路径，例如: /path/to/file.c")
@@ -4,96 +4,140 @@
 """
 
 import sys
-import os
-import json
+import pickle
+import hashlib
 from datetime import datetime
+from pathlib import Path
 
-# 添加项目路径
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.insert(0, os.path.join(project_root, 'Python'))
+# 脚本所在目录和项目路径，模块加载时计算一次
+TEST_DIR = Path(__file__).resolve().parent
+project_root = TEST_DIR.parent
+for path in (str(project_root), str(project_root / 'Python')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
 from pycg_wrapper import PyCGWrapper
+from io_utils import dumps_json
 
+SEP = "=" * 70
 
-def ensure_output_dir(output_dir):
-    """确保输出目录存在"""
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"创建输出目录: {output_dir}")
+# 生成调用图的源码（相对项目根目录）；内容哈希计入缓存键，修改 PyCG 或 pycg_wrapper 后缓存失效
+TOOL_SOURCE_PATTERNS = ('Python/pycg_wrapper.py', 'Python/PyCG/pycg/**/*.py')
 
 
-def analyze_and_save():
-    """分析 python_external_calls.py 并保存结果"""
-    print("="*70)
-    print("分析 Python 外部调用")
-    print("="*70)
-    
-    # 文件路径
-    test_file = os.path.join(os.path.dirname(__file__), 'python_external_calls.py')
-    package_dir = os.path.dirname(test_file)
-    output_dir = os.path.join(os.path.dirname(test_file), 'python_output')
-    
-    # 确保输出目录存在
-    ensure_output_dir(output_dir)
+def save_json(data, output_file, default=None):
+    """保存JSON"""
+    with open(output_file, 'wb') as f:
+        f.write(dumps_json(data, default=default))
+
+
+def _cache_key(test_file):
+    """缓存键：被分析源文件与 TOOL_SOURCE_PATTERNS 匹配的源码的内容哈希"""
+    digest = hashlib.sha1()
+    for path in [test_file] + [p for pattern in TOOL_SOURCE_PATTERNS for p in sorted(project_root.glob(pattern))]:
+        content = path.read_bytes()
+        digest.update(path.relative_to(project_root).as_posix().encode('utf-8') + b'\0')
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def get_fasten_call_graph(wrapper, test_file, output_dir, use_cache=True):
+    """
+    生成 FASTEN 格式调用图；结果以源文件和 PyCG 源码的内容哈希为键缓存在输出目录中，
+    均未变化时直接读取，跳过 PyCG 分析
+    """
+    timestamp = int(datetime.now().timestamp())
+    cache_file = output_dir / f".pycg_cache_{_cache_key(test_file)}.pkl"
     
-    print(f"\n分析文件: {test_file}")
-    print(f"输出目录: {output_dir}")
+    if use_cache:
+        try:
+            with open(cache_file, 'rb') as f:
+                fasten_cg = pickle.load(f)
+            print("\n源文件未变化，使用缓存的 FASTEN 格式调用图...")
+            fasten_cg['timestamp'] = timestamp
+            return fasten_cg
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
     
     # 创建 PyCG Wrapper 并分析
     print("\n正在分析...")
-    wrapper = PyCGWrapper([test_file], package_dir)
     wrapper.analyze()
     
-    # 获取 FASTEN 格式调用图
     print("生成 FASTEN 格式调用图...")
     fasten_cg = wrapper.get_fasten_call_graph(
         product="python_external_calls",
         forge="Local",
         version="1.0.0",
-        timestamp=int(datetime.now().timestamp())
+        timestamp=timestamp
     )
     
-    # 获取外部调用信息
+    with open(cache_file, 'wb') as f:
+        pickle.dump(fasten_cg, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # 只保留刚写入的缓存，旧的缓存不会再被命中
+    for stale in output_dir.glob('.pycg_cache_*.pkl'):
+        if stale != cache_file:
+            stale.unlink(missing_ok=True)
+    
+    return fasten_cg
+
+
+def analyze_and_save(use_cache=True):
+    """分析 python_external_calls.py 并保存结果"""
+    print(SEP)
+    print("分析 Python 外部调用")
+    print(SEP)
+    
+    # 文件路径
+    test_file = TEST_DIR / 'python_external_calls.py'
+    package_dir = TEST_DIR
+    output_dir = TEST_DIR / 'python_output'
+    
+    # 确保输出目录存在
+    output_dir.mkdir(exist_ok=True)
+    
+    print(f"\n分析文件: {test_file}")
+    print(f"输出目录: {output_dir}")
+    
+    # 获取 FASTEN 格式调用图（--no-cache 时忽略缓存重新分析）
+    wrapper = PyCGWrapper([str(test_file)], str(package_dir))
+    fasten_cg = get_fasten_call_graph(wrapper, test_file, output_dir, use_cache)
+    
+    # 获取外部调用信息（复用上面的 FASTEN 调用图，不再重新生成）
     print("获取外部调用信息...")
-    external_calls = wrapper.get_external_calls(
-        include_builtin=False,
-        product="python_external_calls",
-        forge="Local",
-        version="1.0.0",
-        timestamp=int(datetime.now().timestamp())
-    )
+    external_calls = wrapper.get_external_calls(include_builtin=False, fasten_cg=fasten_cg)
     
     # 保存结果
     print("\n保存结果...")
     
     # 1. 保存 FASTEN 格式调用图
-    output_file_1 = os.path.join(output_dir, 'fasten_call_graph.json')
-    with open(output_file_1, 'w', encoding='utf-8') as f:
-        json.dump(fasten_cg, f, indent=2, ensure_ascii=False)
+    output_file_1 = output_dir / 'fasten_call_graph.json'
+    save_json(fasten_cg, output_file_1)
     print(f"✓ 已保存: {output_file_1}")
     
     # 2. 保存外部调用信息
-    output_file_2 = os.path.join(output_dir, 'external_calls.json')
-    with open(output_file_2, 'w', encoding='utf-8') as f:
-        json.dump(external_calls, f, indent=2, ensure_ascii=False)
+    output_file_2 = output_dir / 'external_calls.json'
+    save_json(external_calls, output_file_2, default=dict)
     print(f"✓ 已保存: {output_file_2}")
     
-    # 打印摘要
-    print("\n" + "="*70)
-    print("分析摘要")
-    print("="*70)
+    # 打印摘要：拼接成一段文本，一次写出
     stats = external_calls['statistics']
-    print(f"外部函数总数: {stats['total_undefined']}")
-    print(f"外部模块数量: {stats['modules_count']}")
-    print(f"外部调用总数: {stats['total_call_edges']}")
-    print("\n" + "="*70)
-    print("✓ 分析完成！结果已保存到 python_output/ 目录")
-    print("="*70)
+    sys.stdout.write(
+        f"\n{SEP}\n"
+        f"分析摘要\n"
+        f"{SEP}\n"
+        f"外部函数总数: {stats['total_undefined']}\n"
+        f"外部模块数量: {stats['modules_count']}\n"
+        f"外部调用总数: {stats['total_call_edges']}\n"
+        f"\n{SEP}\n"
+        f"✓ 分析完成！结果已保存到 python_output/ 目录\n"
+        f"{SEP}\n"
+    )
 
 
 if __name__ == "__main__":
     try:
-        analyze_and_save()
+        analyze_and_save(use_cache='--no-cache' not in sys.argv[1:])
     except Exception as e:
         print(f"\n✗ 分析失败: {e}")
         import traceback